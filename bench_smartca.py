@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark luồng ký số VNPT SmartCA: gửi yêu cầu ký, cron kiểm tra trạng thái
+và nhận callback, với máy chủ SmartCA giả lập (smartca_mock_server.py).
+
+Với mỗi mức tải (mặc định 10/100/1000 yêu cầu) script:
+    1. Tạo nhà cung cấp trỏ tới máy chủ giả lập và N yêu cầu ký (Nháp)
+    2. Gọi action_send song song (mỗi luồng 1 cursor riêng)
+    3. Chạy _cron_check_signature_status sau khi giao dịch "đã ký"
+    4. (--odoo-url) Với 1 lô mới: gửi, rồi gửi callback HTTP song song và
+       chạy cron xử lý callback
+và in số yêu cầu/giây, p50/p95 thời gian và số câu SQL của từng pha.
+
+Chỉ chạy trên database thử nghiệm: script commit dữ liệu, gửi email mời ký
+(nên cấu hình SMTP giả) nên phải xác nhận bằng --yes-write-database. Script
+không dùng bản ghi có sẵn: mỗi lô tự tạo đối tác, hợp đồng, nhà cung cấp và
+yêu cầu ký riêng, rồi xóa khi kết thúc (trừ khi --keep). Hợp đồng benchmark
+vẫn chiếm 1 số hợp đồng của loại hợp đồng được dùng.
+
+Dùng:
+    python bench_smartca.py -c odoo.conf -d bench_db --yes-write-database \\
+        --levels 10,100 --odoo-url http://localhost:8069
+"""
+import argparse
+import base64
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+
+import odoo
+from odoo import SUPERUSER_ID, api, fields
+from odoo.modules.registry import Registry
+
+from smartca_mock_server import make_server
+
+# PDF tối thiểu làm tài liệu cần ký
+SAMPLE_PDF = (
+    b"%PDF-1.4\n1 0 obj<<>>endobj\ntrailer<<>>\n%%EOF\n"
+)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * pct / 100.0
+    f = int(k)
+    c = min(f + 1, len(values) - 1)
+    return values[f] + (values[c] - values[f]) * (k - f)
+
+
+class SignatureBenchmark:
+    def __init__(self, registry, args):
+        self.registry = registry
+        self.args = args
+        self.results = []
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def run_in_cursor(self, func):
+        """Chạy func(env) trong cursor riêng, trả về (giây, số câu SQL)"""
+        with self.registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            queries = cr.sql_log_count
+            started = time.monotonic()
+            func(env)
+            env.flush_all()
+            elapsed = time.monotonic() - started
+            return elapsed, cr.sql_log_count - queries
+
+    def record(self, level, phase, count, wall, latencies, queries):
+        self.results.append(
+            {
+                "level": level,
+                "phase": phase,
+                "count": count,
+                "wall": wall,
+                "throughput": count / wall if wall else 0.0,
+                "p50": percentile(latencies, 50) * 1000,
+                "p95": percentile(latencies, 95) * 1000,
+                "queries": queries,
+            }
+        )
+
+    def fan_out(self, level, phase, items, func):
+        """Gọi func(item) song song, mỗi item 1 cursor"""
+        workers = min(len(items), self.args.max_workers)
+        latencies = []
+        queries = 0
+        errors = 0
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(self.run_in_cursor, lambda env, item=item: func(env, item))
+                for item in items
+            ]
+            for future in futures:
+                try:
+                    elapsed, count = future.result()
+                except Exception as e:
+                    errors += 1
+                    print("  %s error: %s" % (phase, e))
+                    continue
+                latencies.append(elapsed)
+                queries += count
+        wall = time.monotonic() - started
+        self.record(level, phase, len(items) - errors, wall, latencies, queries)
+
+    # ------------------------------------------------------------------
+    # Phases
+    # ------------------------------------------------------------------
+
+    def setup(self, level):
+        ids = {}
+
+        def create(env):
+            contract_type = env["trasas.contract.type"].search([], limit=1)
+            if not contract_type:
+                raise SystemExit("Cần ít nhất 1 loại hợp đồng.")
+            tag = uuid.uuid4().hex[:8]
+            partner = env["res.partner"].create(
+                {"name": "SmartCA benchmark %s" % tag, "email": "bench.%s@example.com" % tag}
+            )
+            today = fields.Date.context_today(partner)
+            contract = env["trasas.contract"].create(
+                {
+                    "contract_type_id": contract_type.id,
+                    "partner_id": partner.id,
+                    "title": "SmartCA benchmark %s (%s)" % (level, tag),
+                    "date_start": today,
+                    "date_end": today + timedelta(days=365),
+                }
+            )
+            provider = env["trasas.signature.provider"].create(
+                {
+                    "name": "SmartCA benchmark %s" % level,
+                    "provider_type": "vnpt_smartca",
+                    "api_url": self.args.mock_url,
+                    "api_key": "sp769",
+                    "api_secret": "benchmark",
+                    "test_mode": True,
+                    "log_payload_sample_rate": self.args.sample_rate,
+                }
+            )
+            document = base64.b64encode(SAMPLE_PDF)
+            sig_requests = env["trasas.signature.request"].create(
+                [
+                    {
+                        "contract_id": contract.id,
+                        "provider_id": provider.id,
+                        "document_file": document,
+                        "document_filename": "bench_%s.pdf" % i,
+                        "signing_flow": "trasas_first",
+                        "signer_ids": [
+                            (
+                                0,
+                                0,
+                                {
+                                    "role": "internal" if s == 0 else "external",
+                                    "sign_order": 10,
+                                    "signer_name": "Signer %s-%s" % (i, s),
+                                    "signer_email": "bench%s.%s@example.com" % (i, s),
+                                    "id_number": "0790%08d" % (i * 100 + s),
+                                },
+                            )
+                            for s in range(self.args.signers)
+                        ],
+                    }
+                    for i in range(level)
+                ]
+            )
+            ids.update(
+                partner=partner.id,
+                contract=contract.id,
+                provider=provider.id,
+                requests=sig_requests.ids,
+            )
+
+        self.run_in_cursor(create)
+        return ids
+
+    def phase_send(self, level, request_ids):
+        self.fan_out(
+            level,
+            "action_send",
+            request_ids,
+            lambda env, rid: env["trasas.signature.request"].browse(rid).action_send(),
+        )
+
+    def phase_status_cron(self, level, request_ids):
+        def reset(env):
+            env["trasas.signature.request"].browse(request_ids).write(
+                {"next_status_check": False}
+            )
+
+        self.run_in_cursor(reset)
+        elapsed, queries = self.run_in_cursor(
+            lambda env: env["trasas.signature.request"]._cron_check_signature_status()
+        )
+        self.record(level, "status cron", len(request_ids), elapsed, [elapsed], queries)
+
+    def phase_webhook(self, level, request_ids):
+        tokens = []
+
+        def read_tokens(env):
+            for req in env["trasas.signature.request"].browse(request_ids):
+                tokens.append((req.callback_token, req.signer_ids[:1].vnpt_tran_code))
+
+        self.run_in_cursor(read_tokens)
+        session = requests.Session()
+        url = self.args.odoo_url.rstrip("/") + "/trasas/signature/callback/%s"
+
+        def post(item):
+            token, tran_code = item
+            started = time.monotonic()
+            resp = session.post(
+                url % token,
+                json={"event_id": uuid.uuid4().hex, "tran_code": tran_code},
+                timeout=60,
+            )
+            resp.raise_for_status()
+            return time.monotonic() - started
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=min(len(tokens), self.args.max_workers)) as ex:
+            latencies = list(ex.map(post, tokens))
+        self.record(level, "webhook ack", len(tokens), time.monotonic() - started, latencies, 0)
+
+        total = queries = 0.0
+        while True:
+            pending = []
+
+            def process(env):
+                env["trasas.signature.webhook.event"]._cron_process_events()
+                pending.append(
+                    env["trasas.signature.webhook.event"].search_count(
+                        [("request_id", "in", request_ids), ("state", "=", "pending")]
+                    )
+                )
+
+            elapsed, count = self.run_in_cursor(process)
+            total += elapsed
+            queries += count
+            if not pending[0]:
+                break
+        self.record(level, "webhook worker", len(tokens), total, [total], int(queries))
+
+    def cleanup(self, fixture):
+        """Xóa bản ghi do setup tạo (hợp đồng được đưa về Nháp để xóa được)"""
+
+        def unlink(env):
+            env["trasas.signature.request"].browse(fixture["requests"]).unlink()
+            env["trasas.signature.provider"].browse(fixture["provider"]).unlink()
+            contract = env["trasas.contract"].browse(fixture["contract"]).exists()
+            contract.filtered(lambda c: c.state != "draft").write({"state": "draft"})
+            contract.unlink()
+            env["res.partner"].browse(fixture["partner"]).unlink()
+
+        self.run_in_cursor(unlink)
+
+    def run(self):
+        for level in self.args.levels:
+            print("== %s requests x %s signers" % (level, self.args.signers))
+            phases = [self.phase_status_cron]
+            if self.args.odoo_url:
+                phases.append(self.phase_webhook)
+            # Mỗi pha sau khi gửi dùng 1 lô yêu cầu riêng (callback sẽ hoàn tất
+            # yêu cầu nên không dùng lại cho cron)
+            for phase in phases:
+                fixture = self.setup(level)
+                try:
+                    self.phase_send(level, fixture["requests"])
+                    time.sleep(self.args.sign_after + 0.5)
+                    phase(level, fixture["requests"])
+                finally:
+                    if not self.args.keep:
+                        self.cleanup(fixture)
+        self.report()
+
+    def report(self):
+        header = "%6s  %-15s %6s %9s %10s %10s %10s %9s" % (
+            "level", "phase", "count", "wall(s)", "req/s", "p50(ms)", "p95(ms)", "queries"
+        )
+        print("\n" + header)
+        print("-" * len(header))
+        for r in self.results:
+            print(
+                "%6s  %-15s %6s %9.2f %10.1f %10.1f %10.1f %9s"
+                % (
+                    r["level"], r["phase"], r["count"], r["wall"],
+                    r["throughput"], r["p50"], r["p95"], r["queries"],
+                )
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-c", "--config", required=True, help="File cấu hình Odoo")
+    parser.add_argument("-d", "--database", required=True)
+    parser.add_argument(
+        "--levels", default="10,100,1000",
+        type=lambda v: [int(x) for x in v.split(",") if x],
+    )
+    parser.add_argument("--signers", type=int, default=2, help="Số người ký mỗi yêu cầu")
+    parser.add_argument("--max-workers", type=int, default=16, help="Số luồng/cursor song song")
+    parser.add_argument("--odoo-url", help="URL Odoo đang chạy để thử webhook")
+    parser.add_argument(
+        "--mock-url", help="Dùng máy chủ SmartCA có sẵn thay vì khởi động máy chủ giả lập"
+    )
+    parser.add_argument("--mock-port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--sign-after", type=float, default=2.0)
+    parser.add_argument("--sample-rate", type=float, default=1.0, help="Tỷ lệ lưu payload log API")
+    parser.add_argument("--keep", action="store_true", help="Không xóa dữ liệu đã tạo")
+    parser.add_argument(
+        "--yes-write-database",
+        action="store_true",
+        help="Xác nhận cho phép script commit dữ liệu benchmark vào database",
+    )
+    args = parser.parse_args()
+    if not args.yes_write_database:
+        parser.error(
+            "script tạo/xóa dữ liệu và gửi email trên database %r; chỉ dùng database "
+            "thử nghiệm và thêm --yes-write-database để xác nhận" % args.database
+        )
+
+    mock = None
+    if not args.mock_url:
+        mock = make_server(
+            port=args.mock_port,
+            latency_ms=args.latency_ms,
+            jitter_ms=args.latency_ms / 2,
+            error_rate=args.error_rate,
+            sign_after=args.sign_after,
+        )
+        threading.Thread(target=mock.serve_forever, daemon=True).start()
+        args.mock_url = "http://127.0.0.1:%s" % args.mock_port
+
+    odoo.tools.config.parse_config(["-c", args.config])
+    registry = Registry(args.database)
+    try:
+        SignatureBenchmark(registry, args).run()
+    finally:
+        if mock:
+            print("Mock SmartCA calls: %s" % mock.smartca.calls)
+            mock.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Máy chủ SmartCA giả lập (chạy local) để thử tải luồng ký số VNPT SmartCA.
+
+Cài đặt các endpoint mà trasas.signature.provider gọi:
+    GET  /                                              (test kết nối)
+    POST /sca/<sp>/v1/credentials/get_certificate
+    POST /sca/<sp>/v1/signatures/sign
+    POST /sca/<sp>/v1/signatures/sign/<tran_code>/status
+
+Giao dịch chuyển sang "đã ký" sau --sign-after giây. Có thể cấu hình độ trễ
+và tỷ lệ lỗi (HTTP 503 / lỗi nghiệp vụ status_code != 200).
+
+Dùng:
+    python smartca_mock_server.py --port 8765 --latency-ms 150 --error-rate 0.02
+    -> cấu hình nhà cung cấp VNPT SmartCA với API URL http://127.0.0.1:8765
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STATUS_RE = re.compile(r"/v1/signatures/sign/([^/]+)/status$")
+
+
+class SmartCAState:
+    """Giao dịch đã tạo: {tran_code: thời điểm tạo}"""
+
+    def __init__(self, options):
+        self.options = options
+        self.lock = threading.Lock()
+        self.transactions = {}
+        self.calls = 0
+
+    def delay(self):
+        latency = self.options.latency_ms + random.uniform(0, self.options.jitter_ms)
+        if latency > 0:
+            time.sleep(latency / 1000.0)
+
+
+class SmartCAHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "SmartCAMock/1.0"
+
+    @property
+    def state(self):
+        return self.server.smartca
+
+    def log_message(self, fmt, *args):
+        if self.state.options.verbose:
+            super().log_message(fmt, *args)
+
+    def _send(self, status, body):
+        raw = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(raw or b"{}")
+        except ValueError:
+            return {}
+
+    def do_GET(self):
+        self._send(200, {"status": "ok"})
+
+    def do_POST(self):
+        payload = self._read_json()
+        state = self.state
+        options = state.options
+        with state.lock:
+            state.calls += 1
+        state.delay()
+
+        if random.random() < options.error_rate:
+            return self._send(503, {"message": "service unavailable (mock)"})
+        if random.random() < options.app_error_rate:
+            return self._send(200, {"status_code": 500, "message": "internal error (mock)"})
+
+        path = self.path.split("?", 1)[0]
+        if path.endswith("/v1/credentials/get_certificate"):
+            return self._send(
+                200,
+                {
+                    "status_code": 200,
+                    "message": "success",
+                    "data": {
+                        "user_certificates": [
+                            {"serial_number": "MOCK%s" % (payload.get("user_id") or "0")}
+                        ]
+                    },
+                },
+            )
+        if path.endswith("/v1/signatures/sign"):
+            tran_code = "MOCK-%s" % uuid.uuid4().hex[:12].upper()
+            with state.lock:
+                state.transactions[tran_code] = time.monotonic()
+            return self._send(
+                200,
+                {
+                    "status_code": 200,
+                    "message": "success",
+                    "data": {"tran_code": tran_code, "status": "pending"},
+                },
+            )
+        match = STATUS_RE.search(path)
+        if match:
+            created = state.transactions.get(match.group(1))
+            if created is None:
+                return self._send(
+                    200, {"status_code": 400, "message": "sig_tran_not_exist"}
+                )
+            if time.monotonic() - created < options.sign_after:
+                return self._send(
+                    200,
+                    {"status_code": 200, "message": "pending", "data": {"status": "pending"}},
+                )
+            return self._send(
+                200,
+                {
+                    "status_code": 200,
+                    "message": "signed",
+                    "data": {
+                        "status": "signed",
+                        "signatures": [
+                            {
+                                "signature_value": "MOCKSIG-%s" % match.group(1),
+                                "timestamp_signature": time.strftime("%Y%m%d%H%M%SZ"),
+                            }
+                        ],
+                    },
+                },
+            )
+        self._send(404, {"message": "not found"})
+
+
+def make_server(host="127.0.0.1", port=8765, **kwargs):
+    """Tạo máy chủ giả lập (dùng trong script benchmark)"""
+    defaults = {
+        "latency_ms": 0.0,
+        "jitter_ms": 0.0,
+        "error_rate": 0.0,
+        "app_error_rate": 0.0,
+        "sign_after": 0.0,
+        "verbose": False,
+    }
+    defaults.update(kwargs)
+    server = ThreadingHTTPServer((host, port), SmartCAHandler)
+    server.daemon_threads = True
+    server.smartca = SmartCAState(argparse.Namespace(**defaults))
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="Độ trễ mỗi call")
+    parser.add_argument("--jitter-ms", type=float, default=50.0, help="Độ trễ ngẫu nhiên thêm")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Tỷ lệ trả HTTP 503")
+    parser.add_argument(
+        "--app-error-rate", type=float, default=0.0, help="Tỷ lệ trả status_code 500"
+    )
+    parser.add_argument(
+        "--sign-after", type=float, default=5.0, help="Số giây trước khi giao dịch thành 'đã ký'"
+    )
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = make_server(
+        args.host,
+        args.port,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        app_error_rate=args.app_error_rate,
+        sign_after=args.sign_after,
+        verbose=args.verbose,
+    )
+    print("SmartCA mock listening on http://%s:%s" % (args.host, args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("Total calls: %s" % server.smartca.calls)
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
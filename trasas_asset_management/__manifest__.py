@@ -26,6 +26,7 @@
         "hr",
         "account",
         "documents",
+        "trasas_document_management",
     ],
     "data": [
         # Security
@@ -34,11 +35,11 @@
         # Data
         "data/mail_template_data.xml",
         "data/ir_sequence_data.xml",
+        "data/ir_cron_data.xml",
         "data/document_workspace_data.xml",
         "data/asset_type_data.xml",
         "data/asset_document_type_data.xml",
         "data/asset_stage_data.xml",
-        "data/ir_cron_data.xml",
         # Wizard
         "wizard/asset_contract_wizard_views.xml",
         "wizard/asset_renew_wizard_views.xml",
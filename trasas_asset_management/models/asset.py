@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
+from markupsafe import Markup
+
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
+from odoo.tools import split_every
 from datetime import timedelta
 
 
@@ -21,9 +24,11 @@ class TrasasAsset(models.Model):
 
     _name = "trasas.asset"
     _description = "Tài sản TRASAS"
-    _inherit = ["mail.thread", "mail.activity.mixin"]
+    _inherit = ["mail.thread", "mail.activity.mixin", "trasas.backfill.mixin"]
     _order = "create_date desc, id desc"
 
+    _MAIL_BATCH_SIZE = 100
+
     # =====================================================================
     # 1. THÔNG TIN ĐỊNH DANH
     # =====================================================================
@@ -353,12 +358,15 @@ class TrasasAsset(models.Model):
         return self.env["trasas.asset.stage"].search([], order="sequence")
 
     def _sync_stage_from_state(self):
-        """Đồng bộ stage_id khi state thay đổi"""
-        Stage = self.env["trasas.asset.stage"]
+        """Đồng bộ stage_id khi state thay đổi (1 write cho mỗi stage đích)"""
+        stage_map = self.env["trasas.asset.stage"]._get_state_stage_map()
+        by_stage = {}
         for rec in self:
-            stage = Stage.search([("state", "=", rec.state)], limit=1)
-            if stage and rec.stage_id != stage:
-                rec.stage_id = stage
+            stage_id = stage_map.get(rec.state)
+            if stage_id and rec.stage_id.id != stage_id:
+                by_stage.setdefault(stage_id, []).append(rec.id)
+        for stage_id, ids in by_stage.items():
+            self.browse(ids).write({"stage_id": stage_id})
 
     def _get_next_maintenance_date_from_start(self):
         self.ensure_one()
@@ -485,6 +493,49 @@ class TrasasAsset(models.Model):
         string="Lịch sử hợp đồng",
     )
 
+    # Hợp đồng hiện hành (lưu sẵn, đánh index) - tự cập nhật khi lịch sử HĐ
+    # của tài sản được tạo / sửa / xóa
+    current_contract_id = fields.Many2one(
+        "trasas.asset.contract.history",
+        string="Hợp đồng hiện hành",
+        compute="_compute_current_contract",
+        store=True,
+        index=True,
+    )
+    current_contract_end_date = fields.Date(
+        string="Ngày kết thúc HĐ hiện hành",
+        compute="_compute_current_contract",
+        store=True,
+        index=True,
+    )
+    current_counterparty_id = fields.Many2one(
+        "res.partner",
+        string="Đối tác HĐ hiện hành",
+        compute="_compute_current_contract",
+        store=True,
+        index=True,
+        help="Bên A (bên cho thuê) với tài sản thuê ngoài, Bên B (bên thuê) với tài sản cho thuê",
+    )
+
+    @api.depends(
+        "asset_classification",
+        "contract_history_ids.end_date",
+        "contract_history_ids.party_a_id",
+        "contract_history_ids.party_b_id",
+    )
+    def _compute_current_contract(self):
+        for rec in self:
+            contract = max(
+                rec.contract_history_ids.filtered("end_date"),
+                key=lambda h: (h.end_date, h._origin.id or 0),
+                default=rec.env["trasas.asset.contract.history"],
+            )
+            rec.current_contract_id = contract
+            rec.current_contract_end_date = contract.end_date
+            rec.current_counterparty_id = contract._get_counterparty(
+                rec.asset_classification
+            )
+
     @api.depends("renovation_cost_ids.amount", "renovation_cost_ids.currency_id")
     def _compute_total_renovation_cost(self):
         for rec in self:
@@ -700,11 +751,12 @@ class TrasasAsset(models.Model):
 
     @api.model
     def _create_folders_for_existing(self):
-        records = self.search([("document_folder_id", "=", False)])
-        records._create_document_folder()
-        self.env["trasas.asset.legal.document"].search(
-            []
-        )._sync_attachments_to_document()
+        """Tạo folder + đồng bộ giấy tờ pháp lý cho toàn bộ tài sản (qua cron, chạy theo lô, có checkpoint)"""
+        return self._schedule_backfill("trasas_asset_management.ir_cron_backfill_asset_folders")
+
+    def _backfill_process_batch(self):
+        self.filtered(lambda r: not r.document_folder_id)._create_document_folder()
+        self.legal_document_ids._sync_attachments_to_document()
 
     # =====================================================================
     # STATE TRANSITIONS — CHUNG
@@ -1132,23 +1184,33 @@ class TrasasAsset(models.Model):
         if template:
             template.send_mail(self.id, force_send=True)
 
-    def _send_expiring_document_notification(self, doc):
-        self.ensure_one()
-        template = self.env.ref(
-            "trasas_asset_management.email_template_document_expiring",
-            raise_if_not_found=False,
+    def _send_expiring_document_notification(self, docs):
+        """Gửi email tổng hợp giấy tờ sắp hết hạn (1 email / tài sản, vào hàng đợi)"""
+        self._send_document_digest(
+            "trasas_asset_management.email_template_document_expiring", docs
         )
-        if template:
-            template.with_context(legal_doc=doc).send_mail(self.id, force_send=True)
 
-    def _send_expired_document_notification(self, doc):
-        self.ensure_one()
-        template = self.env.ref(
-            "trasas_asset_management.email_template_document_expired",
-            raise_if_not_found=False,
+    def _send_expired_document_notification(self, docs):
+        """Gửi email tổng hợp giấy tờ đã hết hạn (1 email / tài sản, vào hàng đợi)"""
+        self._send_document_digest(
+            "trasas_asset_management.email_template_document_expired", docs
         )
-        if template:
-            template.with_context(legal_doc=doc).send_mail(self.id, force_send=True)
+
+    def _send_document_digest(self, template_xmlid, docs):
+        """Email chỉ liệt kê các giấy tờ trong ``docs`` (context ``legal_doc_ids``
+        = {asset_id: [doc_id]}), không phải mọi giấy tờ từng ở cùng trạng thái.
+        """
+        template = self.env.ref(template_xmlid, raise_if_not_found=False)
+        if not template:
+            return
+        template = template.with_context(
+            legal_doc_ids={
+                asset.id: asset_docs.ids
+                for asset, asset_docs in docs.grouped("asset_id").items()
+            }
+        )
+        for res_ids in split_every(self._MAIL_BATCH_SIZE, self.ids):
+            template.send_mail_batch(list(res_ids))
 
     # =====================================================================
     # CRON JOB
@@ -1156,69 +1218,106 @@ class TrasasAsset(models.Model):
 
     @api.model
     def _cron_check_expiring_documents(self):
-        """Kiểm tra giấy tờ sắp hết hạn / đã hết hạn"""
+        """Kiểm tra giấy tờ sắp hết hạn / đã hết hạn.
+
+        Xử lý theo lô: 1 write cho mỗi trạng thái đích, mỗi tài sản nhận 1
+        activity, 1 email (hàng đợi) và 1 ghi chú tổng hợp các giấy tờ.
+        """
         today = fields.Date.context_today(self)
         LegalDoc = self.env["trasas.asset.legal.document"]
+        doc_fields = [
+            "name",
+            "asset_id",
+            "certificate_number",
+            "validity_date",
+        ]
 
         # Sắp hết hạn (30 ngày)
         warning_date = today + timedelta(days=30)
-        expiring_docs = LegalDoc.search(
+        expiring_docs = LegalDoc.search_fetch(
             [
                 ("state", "=", "active"),
                 ("validity_date", ">=", today),
                 ("validity_date", "<=", warning_date),
-            ]
+            ],
+            doc_fields,
+            order="asset_id, validity_date, id",
         )
-        for doc in expiring_docs:
-            doc.write({"state": "expiring_soon"})
-            asset = doc.asset_id
-            if asset.responsible_user_id:
-                asset.activity_schedule(
-                    "mail.mail_activity_data_todo",
-                    user_id=asset.responsible_user_id.id,
-                    summary=_('Giấy tờ "%s" sắp hết hạn (%s)')
-                    % (doc.name, doc.validity_date),
-                    note=_("Số GCN: %s\nHết hạn: %s\nCòn %s ngày")
-                    % (
-                        doc.certificate_number or "N/A",
-                        doc.validity_date,
-                        doc.days_to_expire,
-                    ),
-                    date_deadline=doc.validity_date,
-                )
-            asset._send_expiring_document_notification(doc)
-            asset.message_post(
-                body=_('⚠️ Giấy tờ "%s" (GCN: %s) sắp hết hạn vào %s')
-                % (doc.name, doc.certificate_number or "N/A", doc.validity_date),
+        if expiring_docs:
+            expiring_docs.write({"state": "expiring_soon"})
+            self._notify_document_digest(
+                expiring_docs,
+                summary=_("%s giấy tờ sắp hết hạn"),
+                line=_("%(name)s (GCN: %(number)s) - hết hạn %(date)s, còn %(days)s ngày"),
+                body=_("⚠️ Giấy tờ sắp hết hạn:"),
+                deadline=lambda docs: min(docs.mapped("validity_date")),
             )
+            expiring_docs.asset_id._send_expiring_document_notification(expiring_docs)
 
         # Đã hết hạn
-        expired_docs = LegalDoc.search(
+        expired_docs = LegalDoc.search_fetch(
             [
                 ("state", "in", ["active", "expiring_soon"]),
                 ("validity_date", "<", today),
-            ]
+            ],
+            doc_fields,
+            order="asset_id, validity_date, id",
         )
-        for doc in expired_docs:
-            doc.write({"state": "expired"})
-            asset = doc.asset_id
+        if expired_docs:
+            expired_docs.write({"state": "expired"})
+            self._notify_document_digest(
+                expired_docs,
+                summary=_("%s hồ sơ pháp lý đã hết hạn"),
+                line=_("%(name)s (GCN: %(number)s) - hết hạn %(date)s"),
+                body=_("Giấy tờ đã hết hiệu lực, vui lòng kiểm tra và cập nhật:"),
+                deadline=lambda docs: today,
+            )
+            expired_docs.asset_id._send_expired_document_notification(expired_docs)
+
+    @api.model
+    def _notify_document_digest(self, docs, summary, line, body, deadline):
+        """1 activity (người phụ trách) + 1 ghi chú chatter cho mỗi tài sản,
+        liệt kê các giấy tờ trong ``docs``.
+        """
+        docs_by_asset = docs.grouped("asset_id")
+        todo_type = self.env.ref("mail.mail_activity_data_todo")
+        res_model_id = self.env["ir.model"]._get_id(self._name)
+        activity_vals_list = []
+        bodies = {}
+        for asset, asset_docs in docs_by_asset.items():
+            lines = [
+                line
+                % {
+                    "name": doc.name,
+                    "number": doc.certificate_number or "N/A",
+                    "date": doc.validity_date,
+                    "days": doc.days_to_expire,
+                }
+                for doc in asset_docs
+            ]
+            bodies[asset.id] = Markup("%s<ul>%s</ul>") % (
+                body,
+                Markup().join(Markup("<li>%s</li>") % text for text in lines),
+            )
             if asset.responsible_user_id:
-                asset.activity_schedule(
-                    "mail.mail_activity_data_todo",
-                    user_id=asset.responsible_user_id.id,
-                    summary=_('Hồ sơ pháp lý đã hết hạn: "%s"') % doc.name,
-                    note=_("Số GCN: %s\nHết hạn: %s\nVui lòng kiểm tra và cập nhật.")
-                    % (
-                        doc.certificate_number or "N/A",
-                        doc.validity_date,
-                    ),
-                    date_deadline=today,
+                activity_vals_list.append(
+                    {
+                        "activity_type_id": todo_type.id,
+                        "res_model_id": res_model_id,
+                        "res_id": asset.id,
+                        "user_id": asset.responsible_user_id.id,
+                        "summary": summary % len(asset_docs),
+                        "note": Markup("<br/>").join(lines),
+                        "date_deadline": deadline(asset_docs),
+                        "automated": True,
+                    }
                 )
-            asset._send_expired_document_notification(doc)
-            asset.message_post(
-                body=_('Giấy tờ "%s" (GCN: %s) đã hết hiệu lực!')
-                % (doc.name, doc.certificate_number or "N/A"),
-            )
+        if activity_vals_list:
+            # Không dùng mail_activity_quick_update: người phụ trách vẫn nhận
+            # thông báo giao việc như khi tạo từng activity
+            self.env["mail.activity"].create(activity_vals_list)
+        assets = self.browse(list(bodies))
+        assets._message_log_batch(bodies=bodies)
 
     @api.model
     def _cron_auto_maintenance(self):
@@ -1276,71 +1375,108 @@ class TrasasAsset(models.Model):
 
     @api.model
     def _cron_check_contract_expiry(self):
-        """Cảnh báo hợp đồng sắp hết hạn và tự động kết thúc hợp đồng khi đến hạn."""
-        today = fields.Date.context_today(self)
+        """Cảnh báo hợp đồng sắp hết hạn và tự động kết thúc hợp đồng khi đến hạn.
 
-        assets = self.search(
+        Xử lý theo tập: lọc theo ngày kết thúc HĐ hiện hành (trường lưu sẵn),
+        1 query kiểm tra activity đã có, ghi trạng thái / message / activity
+        theo nhóm.
+        """
+        today = fields.Date.context_today(self)
+        domain = [
+            ("state", "in", ["leased", "lease_in", "expiring"]),
+            ("current_contract_end_date", "!=", False),
+        ]
+        [(max_reminder,)] = self._read_group(domain, aggregates=["reminder_days:max"])
+        horizon = today + timedelta(days=max(max_reminder or 0, 7))
+
+        assets = self.search_fetch(
+            domain + [("current_contract_end_date", "<=", horizon)],
             [
-                ("state", "in", ["leased", "lease_in", "expiring"]),
-            ]
+                "name",
+                "state",
+                "reminder_days",
+                "responsible_user_id",
+                "current_contract_end_date",
+            ],
         )
+        end_dates = {rec.id: rec.current_contract_end_date for rec in assets}
 
-        Contract = self.env["trasas.asset.contract.history"]
-        Activity = self.env["mail.activity"]
-
+        to_expiring = self.browse()
+        to_warn = []  # [(asset, end_date, warning_date)]
+        to_end = self.browse()
         for rec in assets:
-            contract = Contract.search(
-                [("asset_id", "=", rec.id), ("end_date", "!=", False)],
-                order="end_date desc, id desc",
-                limit=1,
-            )
-            if not contract or not contract.end_date:
+            end_date = end_dates.get(rec.id)
+            if not end_date:
                 continue
-
-            end_date = contract.end_date
-
-            warn_days = rec.reminder_days or 7
-            warning_date = today + timedelta(days=warn_days)
+            warning_date = today + timedelta(days=rec.reminder_days or 7)
             if end_date == warning_date:
                 if rec.state != "expiring":
-                    rec.write({"state": "expiring"})
-                    rec.message_post(
-                        body=_("Hợp đồng sắp hết hạn vào ngày %s.")
-                        % end_date.strftime("%d/%m/%Y"),
-                        subject=_("Sắp hết hạn hợp đồng"),
-                    )
+                    to_expiring |= rec
                 if rec.responsible_user_id:
-                    existing = Activity.search(
-                        [
-                            ("res_model", "=", "trasas.asset"),
-                            ("res_id", "=", rec.id),
-                            ("summary", "ilike", "Sắp hết hạn hợp đồng"),
-                            ("date_deadline", "=", warning_date),
-                        ],
-                        limit=1,
+                    to_warn.append((rec, end_date, warning_date))
+            elif end_date <= today and rec.state != "contract_ended":
+                to_end |= rec
+
+        if to_expiring:
+            to_expiring.write({"state": "expiring"})
+            to_expiring._message_log_batch(
+                bodies={
+                    rec.id: _("Hợp đồng sắp hết hạn vào ngày %s.")
+                    % end_dates[rec.id].strftime("%d/%m/%Y")
+                    for rec in to_expiring
+                },
+                subject=_("Sắp hết hạn hợp đồng"),
+            )
+
+        if to_warn:
+            # 1 query: activity cảnh báo đã có, theo (tài sản, hạn)
+            existing = {
+                (activity.res_id, activity.date_deadline)
+                for activity in self.env["mail.activity"].search_fetch(
+                    [
+                        ("res_model", "=", self._name),
+                        ("res_id", "in", [rec.id for rec, _e, _w in to_warn]),
+                        ("summary", "ilike", "Sắp hết hạn hợp đồng"),
+                        ("date_deadline", "in", list({w for _r, _e, w in to_warn})),
+                    ],
+                    ["res_id", "date_deadline"],
+                )
+            }
+            todo_type = self.env.ref("mail.mail_activity_data_todo")
+            res_model_id = self.env["ir.model"]._get_id(self._name)
+            activity_vals_list = [
+                {
+                    "activity_type_id": todo_type.id,
+                    "res_model_id": res_model_id,
+                    "res_id": rec.id,
+                    "user_id": rec.responsible_user_id.id,
+                    "summary": _("Sắp hết hạn hợp đồng: %s") % rec.name,
+                    "note": _(
+                        "Hợp đồng sẽ hết hạn vào ngày %s. Vui lòng xem xét tái ký."
                     )
-                    if not existing:
-                        rec.activity_schedule(
-                            "mail.mail_activity_data_todo",
-                            user_id=rec.responsible_user_id.id,
-                            summary=_("Sắp hết hạn hợp đồng: %s") % rec.name,
-                            note=_(
-                                "Hợp đồng sẽ hết hạn vào ngày %s. Vui lòng xem xét tái ký."
-                            )
-                            % end_date.strftime("%d/%m/%Y"),
-                            date_deadline=warning_date,
-                        )
-
-            elif end_date <= today:
-                if rec.state != "contract_ended":
-                    rec.write({"state": "contract_ended"})
-                    rec.message_post(
-                        body=_(
-                            "Hợp đồng đã hết hạn vào ngày %s. Tài sản chuyển sang trạng thái Kết thúc HĐ."
-                        )
-                        % end_date.strftime("%d/%m/%Y"),
-                        subject=_("Kết thúc hợp đồng"),
+                    % end_date.strftime("%d/%m/%Y"),
+                    "date_deadline": warning_date,
+                    "automated": True,
+                }
+                for rec, end_date, warning_date in to_warn
+                if (rec.id, warning_date) not in existing
+            ]
+            if activity_vals_list:
+                # Tạo theo lô nhưng vẫn gửi thông báo giao việc cho người phụ trách
+                self.env["mail.activity"].create(activity_vals_list)
+
+        if to_end:
+            to_end.write({"state": "contract_ended"})
+            to_end._message_log_batch(
+                bodies={
+                    rec.id: _(
+                        "Hợp đồng đã hết hạn vào ngày %s. Tài sản chuyển sang trạng thái Kết thúc HĐ."
                     )
+                    % end_dates[rec.id].strftime("%d/%m/%Y")
+                    for rec in to_end
+                },
+                subject=_("Kết thúc hợp đồng"),
+            )
 
     # =====================================================================
     # SMART BUTTONS
@@ -48,3 +48,15 @@ class TrasasAssetContractHistory(models.Model):
     note = fields.Text(
         string="Ghi chú",
     )
+
+    def _get_counterparty(self, asset_classification):
+        """Đối tác của hợp đồng nhìn từ phía công ty.
+
+        Thuê ngoài: Bên A (bên cho thuê); Cho thuê: Bên B (bên thuê).
+        """
+        if not self:
+            return self.env["res.partner"]
+        self.ensure_one()
+        if asset_classification == "lease_in":
+            return self.party_a_id or self.party_b_id
+        return self.party_b_id or self.party_a_id
@@ -17,6 +17,7 @@ class TrasasAssetLegalDocument(models.Model):
 
     _name = "trasas.asset.legal.document"
     _description = "Giấy tờ pháp lý tài sản"
+    _inherit = ["trasas.expiry.bucket.mixin"]
     _order = "sequence, document_date desc"
 
     sequence = fields.Integer(string="STT", default=10)
@@ -72,7 +73,6 @@ class TrasasAssetLegalDocument(models.Model):
     days_to_expire = fields.Integer(
         string="Số ngày còn lại",
         compute="_compute_days_to_expire",
-        store=True,
         help="Số ngày còn lại đến ngày hết hiệu lực",
     )
     detail = fields.Text(
@@ -137,49 +137,30 @@ class TrasasAssetLegalDocument(models.Model):
             self._sync_attachments_to_document()
         return res
 
-    def _sync_attachments_to_document(self):
-        """Tạo documents.document cho mỗi attachment chưa đồng bộ.
-        Sử dụng cơ chế copy attachment để tránh vi phạm unique constraint của App Documents.
-        """
-        Document = self.env["documents.document"].sudo()
-        Attachment = self.env["ir.attachment"].sudo()
-        for rec in self:
-            if not rec.asset_id or not rec.asset_id.document_folder_id or not rec.attachment_ids:
-                continue
-            
-            folder_id = rec.asset_id.document_folder_id.id
-            
-            # Tìm các attachment đã được sync cho bản ghi này (dựa vào description lưu ID gốc)
-            existing_docs = Document.search([
-                ('folder_id', '=', folder_id),
-                ('res_model', '=', 'trasas.asset.legal.document'),
-                ('res_id', '=', rec.id)
-            ])
-            synced_att_ids = []
-            for d in existing_docs:
-                if d.attachment_id and d.attachment_id.description:
-                    synced_att_ids.append(d.attachment_id.description)
+    def init(self):
+        self.env["trasas.document.attachment.link"]._backfill_from_description(
+            self._name
+        )
 
-            for attachment in rec.attachment_ids:
-                att_key = str(attachment.id)
-                if att_key in synced_att_ids:
-                    continue
-                
-                # Tạo bản sao attachment để tách biệt "chủ sở hữu" (Tránh UniqueViolation)
-                new_att = Attachment.create({
-                    'name': attachment.name,
-                    'datas': attachment.datas,
-                    'mimetype': attachment.mimetype,
-                    'description': att_key, # Lưu lại ID gốc để nhận diện đã sync
-                    'res_model': 'trasas.asset.legal.document',
-                    'res_id': rec.id,
-                })
+    def _sync_attachments_to_document(self):
+        """Tạo documents.document cho mỗi attachment chưa đồng bộ (theo lô).
 
-                Document.create({
-                    "name": rec.name or attachment.name,
-                    "folder_id": folder_id,
-                    "attachment_id": new_att.id,
-                    "owner_id": self.env.user.id,
-                    "res_model": "trasas.asset",
-                    "res_id": rec.asset_id.id,
-                })
+        Document dùng attachment phản chiếu cùng file với attachment gốc (không
+        sao chép nội dung), tránh vi phạm unique constraint của App Documents.
+        File đã đồng bộ được tra qua bảng liên kết trasas.document.attachment.link.
+        """
+        self.env["trasas.document.attachment.link"]._sync_attachments(
+            [
+                (
+                    rec,
+                    rec.attachment_ids,
+                    {
+                        "folder_id": rec.asset_id.document_folder_id.id,
+                        "res_model": "trasas.asset",
+                        "res_id": rec.asset_id.id,
+                    },
+                )
+                for rec in self
+                if rec.asset_id.document_folder_id
+            ]
+        )
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
-from odoo import models, fields
+from odoo import models, fields, api, tools
+from odoo.tools import frozendict
 
 
 class TrasasAssetStage(models.Model):
@@ -64,3 +65,43 @@ class TrasasAssetStage(models.Model):
         string="Yêu cầu",
         help="Mô tả yêu cầu cần hoàn thành ở giai đoạn này",
     )
+
+    _STATE_MAP_FIELDS = ("state", "sequence")
+    _STATE_MAP_CACHE = "trasas.asset.stage.state_map"
+
+    @api.model
+    def _get_state_stage_map(self):
+        """{state: stage_id}: stage đầu tiên của mỗi state (cache theo phiên bản)"""
+        version = self.env["trasas.cache.version"]._get_version(self._STATE_MAP_CACHE)
+        return self._get_state_stage_map_cached(version)
+
+    @api.model
+    @tools.ormcache("version")
+    def _get_state_stage_map_cached(self, version):
+        stage_map = {}
+        for stage in self.sudo().search_fetch([("state", "!=", False)], ["state"]):
+            stage_map.setdefault(stage.state, stage.id)
+        return frozendict(stage_map)
+
+    def _invalidate_state_stage_map(self):
+        self.env["trasas.cache.version"]._bump_version(self._STATE_MAP_CACHE)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        if any(vals.get("state") for vals in vals_list):
+            records._invalidate_state_stage_map()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if any(f in vals for f in self._STATE_MAP_FIELDS):
+            self._invalidate_state_stage_map()
+        return res
+
+    def unlink(self):
+        has_state = any(self.mapped("state"))
+        res = super().unlink()
+        if has_state:
+            self._invalidate_state_stage_map()
+        return res
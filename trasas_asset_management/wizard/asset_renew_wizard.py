@@ -49,10 +49,15 @@ class TrasasAssetRenewWizard(models.TransientModel):
         if self.end_date < self.start_date:
             raise UserError(_("Ngày kết thúc không được nhỏ hơn ngày bắt đầu!"))
 
-        # Tạo lịch sử hợp đồng
+        # Tạo lịch sử hợp đồng (giữ các bên & giá thuê của hợp đồng hiện hành)
+        current = asset.current_contract_id
         self.env["trasas.asset.contract.history"].create(
             {
                 "asset_id": asset.id,
+                "party_a_id": current.party_a_id.id,
+                "party_b_id": current.party_b_id.id,
+                "rent_price": current.rent_price,
+                "currency_id": current.currency_id.id or asset.currency_id.id,
                 "sign_date": self.sign_date,
                 "start_date": self.start_date,
                 "end_date": self.end_date,
@@ -62,10 +62,15 @@ class TrasasAssetReuseWizard(models.TransientModel):
         if self.end_date < self.start_date:
             raise UserError(_("Ngày kết thúc không được nhỏ hơn ngày bắt đầu!"))
 
-        # 1. Tạo lịch sử hợp đồng mới
+        # 1. Tạo lịch sử hợp đồng mới (đối tác mới là Bên A nếu thuê ngoài,
+        # Bên B nếu cho thuê)
+        party_field = (
+            "party_a_id" if asset.asset_classification == "lease_in" else "party_b_id"
+        )
         self.env["trasas.asset.contract.history"].create(
             {
                 "asset_id": asset.id,
+                party_field: self.partner_id.id,
                 "sign_date": self.sign_date,
                 "start_date": self.start_date,
                 "end_date": self.end_date,
@@ -4,6 +4,7 @@ from . import contract_stage
 from . import contract_config
 from . import res_config_settings
 from . import contract
+from . import contract_number
 from . import contract_appendix
 from . import contract_reject_wizard
 from . import contract_cancel_wizard
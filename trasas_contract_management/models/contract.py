@@ -1,16 +1,30 @@
 # -*- coding: utf-8 -*-
-from odoo import models, fields, api, _
-from odoo.exceptions import UserError, ValidationError
+import logging
+from collections import defaultdict
 from datetime import timedelta
 
+from odoo import models, fields, api, tools, _
+from odoo.exceptions import UserError, ValidationError
+from odoo.tools import frozendict, split_every
+
+_logger = logging.getLogger(__name__)
+
 
 class TrasasContract(models.Model):
     """Model chính - Quản lý hợp đồng TRASAS"""
 
     _name = "trasas.contract"
     _description = "Hợp đồng TRASAS"
-    _inherit = ["mail.thread", "mail.activity.mixin"]
+    _inherit = [
+        "mail.thread",
+        "mail.activity.mixin",
+        "trasas.backfill.mixin",
+        "trasas.expiry.bucket.mixin",
+    ]
     _order = "create_date desc, id desc"
+    _expiry_date_field = "date_end"
+
+    _MAIL_BATCH_SIZE = 100
 
     # ============ KANBAN STAGE ============
     stage_id = fields.Many2one(
@@ -460,16 +474,42 @@ class TrasasContract(models.Model):
     )
 
     # ============ COMPUTED FIELDS ============
+    @api.model
+    @tools.ormcache("self.env.uid", cache="groups")
+    def _get_user_capabilities(self):
+        """
+        Tập quyền của user hiện tại dùng cho các compute phân quyền hiển thị nút.
+        Cache theo uid, tự xóa khi nhóm quyền thay đổi (cache 'groups' của registry).
+        """
+        user = self.env.user
+        return frozendict(
+            {
+                "is_admin": user.has_group("base.group_system"),
+                "is_user": user.has_group(
+                    "trasas_contract_management.group_contract_user"
+                ),
+                "is_manager": user.has_group(
+                    "trasas_contract_management.group_contract_manager"
+                ),
+                "is_approver": user.has_group(
+                    "trasas_contract_management.group_contract_approver"
+                ),
+                "is_reviewer": user.has_group(
+                    "trasas_contract_management.group_contract_reviewer"
+                ),
+                "todo_type_id": self.env.ref("mail.mail_activity_data_todo").id,
+            }
+        )
+
     @api.depends_context("uid")
     def _compute_is_approver(self):
         """
         Kiểm tra user hiện tại có phải Approver (Giám đốc) không.
         Cho phép Admin thấy luôn để quản trị.
         """
-        is_approver = self.env.user.has_group(
-            "trasas_contract_management.group_contract_approver"
-        )
-        is_admin = self.env.user.has_group("base.group_system")
+        caps = self._get_user_capabilities()
+        is_approver = caps["is_approver"]
+        is_admin = caps["is_admin"]
         for record in self:
             record.is_approver = is_approver or is_admin
 
@@ -478,16 +518,12 @@ class TrasasContract(models.Model):
         Kiểm tra user có thuộc nhóm Vận hành thuần túy không (để hiện nút Xác nhận hoàn tất)
         Ẩn đối với HCNS, BGĐ và GĐ Nghiệp vụ theo yêu cầu.
         """
-        user = self.env.user
-        is_admin = user.has_group("base.group_system")
-        is_user = user.has_group("trasas_contract_management.group_contract_user")
-        is_manager = user.has_group("trasas_contract_management.group_contract_manager")
-        is_approver = user.has_group(
-            "trasas_contract_management.group_contract_approver"
-        )
-        is_reviewer = user.has_group(
-            "trasas_contract_management.group_contract_reviewer"
-        )
+        caps = self._get_user_capabilities()
+        is_admin = caps["is_admin"]
+        is_user = caps["is_user"]
+        is_manager = caps["is_manager"]
+        is_approver = caps["is_approver"]
+        is_reviewer = caps["is_reviewer"]
 
         for record in self:
             # Hiện cho User nhưng ẩn cho Manager/Approver/Reviewer (dù có inherit)
@@ -503,10 +539,15 @@ class TrasasContract(models.Model):
     @api.depends_context("uid")
     def _compute_is_cancel_dept_approver(self):
         """Kiểm tra user hiện tại có phải trưởng phòng của người yêu cầu hủy"""
-        is_admin = self.env.user.has_group("base.group_system")
-        is_manager = self.env.user.has_group(
-            "trasas_contract_management.group_contract_manager"
-        )
+        caps = self._get_user_capabilities()
+        is_admin = caps["is_admin"]
+        is_manager = caps["is_manager"]
+        # Trưởng phòng của tất cả người yêu cầu hủy (1 lần cho cả recordset)
+        manager_map = {}
+        if not is_admin:
+            manager_map = self.env["hr.employee"]._get_manager_user_map(
+                self.cancel_requester_id.ids
+            )
         for record in self:
             if is_admin:
                 record.is_cancel_dept_approver = True
@@ -514,14 +555,9 @@ class TrasasContract(models.Model):
             if not record.cancel_requester_id:
                 record.is_cancel_dept_approver = False
                 continue
-            # Tìm employee của người yêu cầu hủy
-            employee = self.env["hr.employee"].sudo().search(
-                [("user_id", "=", record.cancel_requester_id.id)], limit=1
-            )
-            if employee and employee.parent_id and employee.parent_id.user_id:
-                record.is_cancel_dept_approver = (
-                    employee.parent_id.user_id.id == self.env.user.id
-                )
+            manager_user_id = manager_map.get(record.cancel_requester_id.id)
+            if manager_user_id:
+                record.is_cancel_dept_approver = manager_user_id == self.env.user.id
             else:
                 # Nếu không tìm được trưởng phòng, cho manager duyệt
                 record.is_cancel_dept_approver = is_manager
@@ -530,10 +566,15 @@ class TrasasContract(models.Model):
     @api.depends_context("uid")
     def _compute_is_draft_dept_approver(self):
         """Kiểm tra user hiện tại có phải trưởng phòng của người yêu cầu về nháp"""
-        is_admin = self.env.user.has_group("base.group_system")
-        is_manager = self.env.user.has_group(
-            "trasas_contract_management.group_contract_manager"
-        )
+        caps = self._get_user_capabilities()
+        is_admin = caps["is_admin"]
+        is_manager = caps["is_manager"]
+        # Trưởng phòng của tất cả người yêu cầu về nháp (1 lần cho cả recordset)
+        manager_map = {}
+        if not is_admin:
+            manager_map = self.env["hr.employee"]._get_manager_user_map(
+                self.draft_requester_id.ids
+            )
         for record in self:
             if is_admin:
                 record.is_draft_dept_approver = True
@@ -541,14 +582,9 @@ class TrasasContract(models.Model):
             if not record.draft_requester_id:
                 record.is_draft_dept_approver = False
                 continue
-            # Tìm employee của người yêu cầu về nháp
-            employee = self.env["hr.employee"].sudo().search(
-                [("user_id", "=", record.draft_requester_id.id)], limit=1
-            )
-            if employee and employee.parent_id and employee.parent_id.user_id:
-                record.is_draft_dept_approver = (
-                    employee.parent_id.user_id.id == self.env.user.id
-                )
+            manager_user_id = manager_map.get(record.draft_requester_id.id)
+            if manager_user_id:
+                record.is_draft_dept_approver = manager_user_id == self.env.user.id
             else:
                 # Nếu không tìm được trưởng phòng, cho manager duyệt
                 record.is_draft_dept_approver = is_manager
@@ -564,9 +600,9 @@ class TrasasContract(models.Model):
         4. HOẶC là Admin/Manager (quyền quản trị)
         """
         current_user_id = self.env.user.id
-        todo_type_id = self.env.ref("mail.mail_activity_data_todo").id
-        user = self.env.user
-        is_admin = user.has_group("base.group_system")
+        caps = self._get_user_capabilities()
+        todo_type_id = caps["todo_type_id"]
+        is_admin = caps["is_admin"]
 
         for record in self:
             if record.state != "in_review":
@@ -607,15 +643,11 @@ class TrasasContract(models.Model):
         3. HOẶC user thuộc nhóm Approver thì thấy nút phê duyệt luôn.
         """
         current_user_id = self.env.user.id
-        todo_type_id = self.env.ref("mail.mail_activity_data_todo").id
-        user = self.env.user
-        is_admin = user.has_group("base.group_system")
-        is_approver_group = user.has_group(
-            "trasas_contract_management.group_contract_approver"
-        )
-        is_reviewer_group = user.has_group(
-            "trasas_contract_management.group_contract_reviewer"
-        )
+        caps = self._get_user_capabilities()
+        todo_type_id = caps["todo_type_id"]
+        is_admin = caps["is_admin"]
+        is_approver_group = caps["is_approver"]
+        is_reviewer_group = caps["is_reviewer"]
 
         for record in self:
             # Ban giám đốc hoặc GĐ Nghiệp vụ được thấy nút phê duyệt của bất kỳ hợp đồng nào đang chờ
@@ -733,6 +765,8 @@ class TrasasContract(models.Model):
     @api.model_create_multi
     def create(self, vals_list):
         """Tạo số hợp đồng tự động"""
+        # Gom theo loại hợp đồng để cấp 1 khối số cho mỗi loại (import hàng loạt)
+        vals_by_type = defaultdict(list)
         for vals in vals_list:
             if vals.get("name", "New") == "New":
                 contract_type = self.env["trasas.contract.type"].browse(
@@ -740,12 +774,18 @@ class TrasasContract(models.Model):
                 )
                 if contract_type and contract_type.name_pattern:
                     # Sử dụng pattern từ loại hợp đồng
-                    vals["name"] = self._generate_contract_number(contract_type)
+                    vals_by_type[contract_type].append(vals)
                 else:
                     # Sequence mặc định
                     vals["name"] = (
                         self.env["ir.sequence"].next_by_code("trasas.contract") or "New"
                     )
+        for contract_type, type_vals_list in vals_by_type.items():
+            names = self._generate_contract_number(
+                contract_type, count=len(type_vals_list)
+            )
+            for vals, name in zip(type_vals_list, names):
+                vals["name"] = name
         records = super().create(vals_list)
         records._create_document_folder()
         return records
@@ -777,7 +817,7 @@ class TrasasContract(models.Model):
                         vals.get("stamped_file"),
                         vals.get("stamped_filename") or f"Ban_Dong_Dau_{rec.name}.pdf",
                     )
-                rec.sudo()._sync_attachments_to_document()
+            self.sudo()._sync_attachments_to_document()
 
         return res
 
@@ -852,18 +892,19 @@ class TrasasContract(models.Model):
 
     @api.model
     def _create_folders_for_existing(self):
+        """Tạo folder + đồng bộ file cho toàn bộ hợp đồng (qua cron, chạy theo lô, có checkpoint)"""
+        return self._schedule_backfill("trasas_contract_management.ir_cron_backfill_contract_folders")
+
+    def _backfill_process_batch(self):
         # 1. Tạo folder cho những thằng chưa có
-        records_no_folder = self.search([("document_folder_id", "=", False)])
-        records_no_folder._create_document_folder()
+        self.filtered(lambda r: not r.document_folder_id)._create_document_folder()
 
-        # 2. Đồng bộ file cho TOÀN BỘ hợp đồng (chỉ những thằng folder đang active)
-        # Search lại để lấy danh sách mới nhất sau Step 1
-        all_contracts = self.search([("document_folder_id", "!=", False)])
+        # 2. Đồng bộ file cho các hợp đồng trong lô (chỉ những thằng folder đang active)
+        # Skip nếu folder vẫn archived (trường hợp hiếm)
+        all_contracts = self.filtered(
+            lambda r: r.document_folder_id and r.document_folder_id.active
+        )
         for rec in all_contracts:
-            # Skip nếu folder vẫn archived (trường hợp hiếm)
-            if not rec.document_folder_id.active:
-                continue
-
             # Tạo attachment cho các trường binary nếu đã có dữ liệu nhưng chưa có attachment
             if rec.final_scan_file:
                 rec._create_attachment_from_binary(
@@ -875,60 +916,123 @@ class TrasasContract(models.Model):
                     rec.stamped_file,
                     rec.stamped_filename or f"Ban_Dong_Dau_{rec.name}.pdf",
                 )
-            rec._sync_attachments_to_document()
+        all_contracts._sync_attachments_to_document()
 
     def _sync_attachments_to_document(self):
         """Đồng bộ các file đính kèm của Hợp đồng sang ứng dụng Documents.
         Bao gồm cả Chatter và các trường Binary (final_scan_file, stamped_file).
+
+        Chạy theo lô trên toàn bộ recordset:
+        - 1 query lấy toàn bộ attachment của các hợp đồng
+        - 1 query lấy các document đã tồn tại cho các attachment đó
+        - 1 lệnh create(vals_list) cho các document còn thiếu
+        - 1 lệnh write cho mỗi folder đích với các document bị đặt sai folder
+
+        Returns:
+            dict: Số lượng document {"created", "moved", "skipped"}
         """
-        self.ensure_one()
+        stats = {"created": 0, "moved": 0, "skipped": 0}
+
         # Đảm bảo folder đã được tạo trước khi sync
-        if not self.document_folder_id:
-            self.sudo()._create_document_folder()
+        missing_folder = self.filtered(lambda r: not r.document_folder_id)
+        if missing_folder:
+            missing_folder.sudo()._create_document_folder()
 
-        if not self.document_folder_id or not self.document_folder_id.active:
-            return
+        records = self.filtered(
+            lambda r: r.document_folder_id and r.document_folder_id.active
+        )
+        if not records:
+            return stats
 
         Document = self.env["documents.document"].sudo()
         Attachment = self.env["ir.attachment"].sudo()
 
         # Tìm toàn bộ attachment liên quan (cả chatter và binary field)
-        domain = [
-            ("res_model", "=", self._name),
-            ("res_id", "=", self.id),
-        ]
-        attachments = Attachment.search(domain)
+        attachments = Attachment.search(
+            [
+                ("res_model", "=", self._name),
+                ("res_id", "in", records.ids),
+            ]
+        )
+        if not attachments:
+            return stats
 
+        folder_by_record = {rec.id: rec.document_folder_id.id for rec in records}
+
+        # Các document đã tồn tại cho những attachment này (1 query)
+        existing_by_attachment = {}
+        for doc in Document.search([("attachment_id", "in", attachments.ids)]):
+            existing_by_attachment.setdefault(doc.attachment_id.id, doc)
+
+        vals_list = []
+        to_move = defaultdict(lambda: Document)
         for attachment in attachments:
-            # Kiểm tra xem đã tồn tại doc cho attachment này chưa
-            existing = Document.search([("attachment_id", "=", attachment.id)], limit=1)
+            folder_id = folder_by_record[attachment.res_id]
+            existing = existing_by_attachment.get(attachment.id)
             if not existing:
-                try:
-                    Document.create(
-                        {
-                            "attachment_id": attachment.id,
-                            "folder_id": self.document_folder_id.id,
-                            "name": attachment.name,
-                        }
-                    )
-                except Exception:
-                    # Bỏ qua nếu có lỗi để không làm gián đoạn luồng chính
-                    pass
-            else:
+                vals_list.append(
+                    {
+                        "attachment_id": attachment.id,
+                        "folder_id": folder_id,
+                        "name": attachment.name,
+                    }
+                )
+            elif existing.folder_id.id != folder_id:
                 # Đảm bảo nó nằm đúng folder của hợp đồng nếu nó bị Odoo tự động đưa vào folder khác
-                if existing.folder_id != self.document_folder_id:
-                    existing.write({'folder_id': self.document_folder_id.id})
+                to_move[folder_id] |= existing
+            else:
+                stats["skipped"] += 1
+
+        if vals_list:
+            stats["created"] += self._create_documents_batch(vals_list)
+            stats["skipped"] += len(vals_list) - stats["created"]
+
+        for folder_id, documents in to_move.items():
+            documents.write({"folder_id": folder_id})
+            stats["moved"] += len(documents)
+
+        return stats
+
+    def _create_documents_batch(self, vals_list):
+        """Tạo hàng loạt documents.document, trả về số bản ghi đã tạo.
+
+        Thử tạo cả lô trong 1 savepoint; nếu lỗi thì tạo lần lượt từng bản ghi
+        và bỏ qua bản ghi lỗi để không làm gián đoạn luồng chính.
+        """
+        Document = self.env["documents.document"].sudo()
+        try:
+            with self.env.cr.savepoint():
+                return len(Document.create(vals_list))
+        except Exception:
+            _logger.warning(
+                "Bulk document sync failed for %s, retrying one by one", self._name
+            )
+
+        created = 0
+        for vals in vals_list:
+            try:
+                with self.env.cr.savepoint():
+                    Document.create(vals)
+                created += 1
+            except Exception:
+                _logger.warning(
+                    "Skip syncing attachment %s to Documents", vals["attachment_id"]
+                )
+        return created
 
     def action_sync_documents(self):
         """Nút bấm thủ công để đồng bộ lại toàn bộ tài liệu sang Documents app"""
         self.ensure_one()
-        self.sudo()._sync_attachments_to_document()
+        stats = self.sudo()._sync_attachments_to_document()
         return {
             'type': 'ir.actions.client',
             'tag': 'display_notification',
             'params': {
                 'title': _('Thành công'),
-                'message': _('Đã đồng bộ tài liệu sang Documents app.'),
+                'message': _(
+                    'Đã đồng bộ tài liệu sang Documents app '
+                    '(mới: %(created)s, di chuyển: %(moved)s, bỏ qua: %(skipped)s).'
+                ) % stats,
                 'type': 'success',
                 'sticky': False,
             }
@@ -950,24 +1054,31 @@ class TrasasContract(models.Model):
             },
         }
 
-    def _generate_contract_number(self, contract_type):
-        """Tạo số hợp đồng theo pattern"""
-        # Đếm số hợp đồng cùng loại trong năm
+    def _generate_contract_number(self, contract_type, count=None):
+        """Tạo số hợp đồng theo pattern
+
+        Số thứ tự được cấp từ bộ đếm theo (loại hợp đồng, năm), xem
+        ``trasas.contract.number.counter``.
+
+        Args:
+            contract_type: Loại hợp đồng
+            count (int): Nếu truyền, cấp trước 1 khối ``count`` số và trả về list
+
+        Returns:
+            str | list[str]: Số hợp đồng (hoặc danh sách số nếu có ``count``)
+        """
         year = fields.Date.context_today(self).year
-        count = (
-            self.search_count(
-                [
-                    ("contract_type_id", "=", contract_type.id),
-                    ("create_date", ">=", f"{year}-01-01"),
-                    ("create_date", "<=", f"{year}-12-31"),
-                ]
-            )
-            + 1
+        sequences = self.env["trasas.contract.number.counter"].sudo()._allocate(
+            contract_type, year, count or 1
         )
 
         # Format theo pattern
         pattern = contract_type.name_pattern or "{code}/{year}/{sequence:04d}"
-        return pattern.format(code=contract_type.code, year=year, sequence=count)
+        names = [
+            pattern.format(code=contract_type.code, year=year, sequence=sequence)
+            for sequence in sequences
+        ]
+        return names if count else names[0]
 
     # ============ STATE WORKFLOW ACTIONS ============
     def action_submit_for_approval(self):
@@ -1691,12 +1802,10 @@ class TrasasContract(models.Model):
         self.ensure_one()
 
         # Tìm trưởng phòng của người yêu cầu
-        employee = self.env["hr.employee"].search(
-            [("user_id", "=", self.env.user.id)], limit=1
-        )
-        dept_manager = False
-        if employee and employee.parent_id and employee.parent_id.user_id:
-            dept_manager = employee.parent_id.user_id
+        manager_user_id = self.env["hr.employee"]._get_manager_user_map(
+            [self.env.user.id]
+        )[self.env.user.id]
+        dept_manager = self.env["res.users"].browse(manager_user_id) or False
 
         # Nếu không tìm thấy trưởng phòng, dùng manager group
         if not dept_manager:
@@ -1851,12 +1960,10 @@ class TrasasContract(models.Model):
         self.ensure_one()
 
         # Lấy employee manager/trưởng phòng nếu có
-        employee = self.env["hr.employee"].search(
-            [("user_id", "=", self.env.user.id)], limit=1
-        )
-        dept_manager = False
-        if employee and employee.parent_id and employee.parent_id.user_id:
-            dept_manager = employee.parent_id.user_id
+        manager_user_id = self.env["hr.employee"]._get_manager_user_map(
+            [self.env.user.id]
+        )[self.env.user.id]
+        dept_manager = self.env["res.users"].browse(manager_user_id) or False
 
         # Nếu không có nhóm trưởng thì gửi manager
         if not dept_manager:
@@ -2066,25 +2173,47 @@ class TrasasContract(models.Model):
             ]
         )
 
-        for contract in expiring_contracts:
-            contract._send_expiring_notification()
+        # Email được đưa vào hàng đợi (mail queue), gửi theo lô
+        expiring_contracts._send_expiring_notification()
 
-            # Tạo Activity cho nhóm Vận hành (tránh trùng lặp)
-            existing_activities = contract.activity_ids.filtered(
-                lambda a: a.summary and "hết hạn" in (a.summary or "").lower()
+        # Tạo Activity cho nhóm Vận hành (tránh trùng lặp)
+        # 1 query: các hợp đồng đã có activity cảnh báo hết hạn đang mở
+        notified_ids = set(
+            self.env["mail.activity"]
+            .sudo()
+            .search_fetch(
+                [
+                    ("res_model", "=", self._name),
+                    ("res_id", "in", expiring_contracts.ids),
+                    ("summary", "ilike", "hết hạn"),
+                ],
+                ["res_id"],
             )
-            if not existing_activities:
-                users = contract._get_users_from_group(
-                    "trasas_contract_management.group_contract_user"
-                )
-                for user in users:
-                    contract._schedule_activity(
-                        user.id,
-                        _("⚠️ HĐ sắp hết hạn (%s ngày): %s")
-                        % (contract.days_to_expire, contract.name),
-                        deadline=0,
-                        note="B20 - Cảnh báo hợp đồng sắp hết hạn",
-                    )
+            .mapped("res_id")
+        )
+        to_notify = expiring_contracts.filtered(lambda c: c.id not in notified_ids)
+        users = self._get_users_from_group(
+            "trasas_contract_management.group_contract_user"
+        )
+        if to_notify and users:
+            todo_type = self.env.ref("mail.mail_activity_data_todo")
+            res_model_id = self.env["ir.model"]._get_id(self._name)
+            activity_vals_list = [
+                {
+                    "activity_type_id": todo_type.id,
+                    "res_model_id": res_model_id,
+                    "res_id": contract.id,
+                    "user_id": user.id,
+                    "summary": _("⚠️ HĐ sắp hết hạn (%s ngày): %s")
+                    % (contract.days_to_expire, contract.name),
+                    "note": "B20 - Cảnh báo hợp đồng sắp hết hạn",
+                    "date_deadline": today,
+                    "automated": True,
+                }
+                for contract in to_notify
+                for user in users
+            ]
+            self.env["mail.activity"].create(activity_vals_list)
 
         # [B20] Tự động chuyển hợp đồng hết hạn sang trạng thái Expired
         expired_contracts = self.search(
@@ -2093,13 +2222,11 @@ class TrasasContract(models.Model):
                 ("date_end", "<", today),
             ]
         )
-
-        for contract in expired_contracts:
-            contract.write({"state": "expired"})
-            contract.message_post(
-                body=_(
-                    "⏰ [B20] Hợp đồng đã hết hạn - Chuyển sang trạng thái Expired."
-                ),
+        if expired_contracts:
+            expired_contracts.write({"state": "expired"})
+            body = _("⏰ [B20] Hợp đồng đã hết hạn - Chuyển sang trạng thái Expired.")
+            expired_contracts._message_log_batch(
+                bodies={contract.id: body for contract in expired_contracts},
                 subject=_("Hợp đồng hết hạn"),
             )
 
@@ -2127,14 +2254,15 @@ class TrasasContract(models.Model):
             contract._send_signing_deadline_notification()
 
     def _send_expiring_notification(self):
-        """Gửi email thông báo hợp đồng sắp hết hạn"""
-        self.ensure_one()
+        """Gửi email thông báo hợp đồng sắp hết hạn (đưa vào hàng đợi theo lô)"""
         template = self.env.ref(
             "trasas_contract_management.email_template_contract_expiring",
             raise_if_not_found=False,
         )
-        if template:
-            template.send_mail(self.id, force_send=True)
+        if not template:
+            return
+        for res_ids in split_every(self._MAIL_BATCH_SIZE, self.ids):
+            template.send_mail_batch(list(res_ids))
 
     def _send_signing_deadline_notification(self):
         """Gửi email nhắc nhở hạn ký"""
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+import psycopg2
+
+from odoo import models, fields, api
+from odoo.tools import SQL
+
+
+class TrasasContractNumberCounter(models.Model):
+    """Bộ đếm số hợp đồng - 1 dòng cho mỗi (Loại hợp đồng, Năm).
+
+    Mỗi bộ đếm dùng 1 sequence PostgreSQL riêng: ``nextval`` không khóa dòng
+    và không tham gia giao dịch, nên nhiều worker tạo hợp đồng song song
+    không phải chờ nhau và không gặp lỗi serialization. Đổi lại, số đã cấp
+    cho giao dịch bị rollback sẽ bị bỏ qua (có thể có khoảng trống).
+    """
+
+    _name = "trasas.contract.number.counter"
+    _description = "Bộ đếm số hợp đồng"
+    _order = "year desc, contract_type_id"
+
+    contract_type_id = fields.Many2one(
+        "trasas.contract.type",
+        string="Loại hợp đồng",
+        required=True,
+        ondelete="cascade",
+        readonly=True,
+    )
+    year = fields.Integer(string="Năm", required=True, readonly=True)
+    last_number = fields.Integer(
+        string="Số đã cấp gần nhất",
+        compute="_compute_last_number",
+        help="Số thứ tự cuối cùng đã cấp trong năm cho loại hợp đồng này",
+    )
+
+    def init(self):
+        self.env.cr.execute(
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS trasas_contract_number_counter_type_year_uniq
+            ON trasas_contract_number_counter (contract_type_id, year)
+            """
+        )
+
+    def unlink(self):
+        names = [self._sequence_name(rec.contract_type_id.id, rec.year) for rec in self]
+        res = super().unlink()
+        # Sequence không bị xóa theo dòng bộ đếm: xóa để không tồn đọng / bị
+        # bộ đếm khác cùng (loại, năm) dùng lại
+        for name in names:
+            self.env.cr.execute(SQL("DROP SEQUENCE IF EXISTS %s", SQL.identifier(name)))
+        return res
+
+    @api.model
+    def _sequence_name(self, contract_type_id, year):
+        return "trasas_contract_number_%s_%s" % (contract_type_id, year)
+
+    def _compute_last_number(self):
+        for rec in self:
+            name = self._sequence_name(rec.contract_type_id.id, rec.year)
+            self.env.cr.execute(
+                SQL(
+                    "SELECT CASE WHEN is_called THEN last_value ELSE last_value - 1 END"
+                    " FROM %s",
+                    SQL.identifier(name),
+                )
+                if self._sequence_exists(name)
+                else SQL("SELECT 0")
+            )
+            rec.last_number = self.env.cr.fetchone()[0]
+
+    @api.model
+    def _sequence_exists(self, name):
+        self.env.cr.execute("SELECT to_regclass(%s)", (name,))
+        return bool(self.env.cr.fetchone()[0])
+
+    @api.model
+    def _ensure_sequence(self, contract_type_id, year, start):
+        """Tạo sequence của bộ đếm nếu chưa có (bắt đầu từ ``start``)"""
+        name = self._sequence_name(contract_type_id, year)
+        if self._sequence_exists(name):
+            return name
+        try:
+            with self.env.cr.savepoint():
+                self.env.cr.execute(
+                    SQL(
+                        "CREATE SEQUENCE IF NOT EXISTS %s START WITH %s MINVALUE 1",
+                        SQL.identifier(name),
+                        max(start, 1),
+                    )
+                )
+        except (psycopg2.errors.UniqueViolation, psycopg2.errors.DuplicateTable):
+            # Worker khác vừa tạo cùng sequence
+            pass
+        return name
+
+    @api.model
+    def _initial_number(self, contract_type, year):
+        """Số bắt đầu khi chưa có bộ đếm: tiếp nối số hợp đồng đã tạo trong năm"""
+        return self.env["trasas.contract"].with_context(active_test=False).search_count(
+            [
+                ("contract_type_id", "=", contract_type.id),
+                ("create_date", ">=", f"{year}-01-01"),
+                ("create_date", "<", f"{year + 1}-01-01"),
+            ]
+        )
+
+    @api.model
+    def _allocate(self, contract_type, year, count=1):
+        """Cấp ``count`` số cho (loại hợp đồng, năm) bằng ``nextval``.
+
+        Dùng cho cả tạo đơn lẻ và cấp trước 1 khối số khi import hàng loạt.
+        Khi có worker khác cấp số cùng lúc, khối số có thể không liên tiếp.
+
+        Returns:
+            list[int]: Các số thứ tự đã cấp, tăng dần
+        """
+        cr = self.env.cr
+        name = self._sequence_name(contract_type.id, year)
+        if not self._sequence_exists(name):
+            # Lần đầu trong năm: khởi tạo bộ đếm và sequence
+            cr.execute(
+                """
+                INSERT INTO trasas_contract_number_counter
+                    (contract_type_id, year,
+                     create_uid, create_date, write_uid, write_date)
+                VALUES (%s, %s, %s, (now() at time zone 'UTC'),
+                        %s, (now() at time zone 'UTC'))
+                ON CONFLICT (contract_type_id, year) DO NOTHING
+                """,
+                (contract_type.id, year, self.env.uid, self.env.uid),
+            )
+            self._ensure_sequence(
+                contract_type.id, year, self._initial_number(contract_type, year) + 1
+            )
+        cr.execute(
+            SQL(
+                "SELECT nextval(%s) FROM generate_series(1, %s)",
+                name,
+                count,
+            )
+        )
+        return sorted(row[0] for row in cr.fetchall())
@@ -101,6 +101,10 @@ class ContractType(models.Model):
                 rec.document_folder_id.sudo().write({"active": False})
             if rec.document_type_id:
                 rec.document_type_id.sudo().unlink()
+        # Xóa bộ đếm số hợp đồng qua ORM (kèm sequence) thay vì để cascade
+        self.env["trasas.contract.number.counter"].sudo().search(
+            [("contract_type_id", "in", self.ids)]
+        ).unlink()
         return super().unlink()
 
     def _create_document_folder(self):
@@ -37,6 +37,7 @@
         "views/signature_provider_views.xml",
         "views/signature_request_views.xml",
         "views/signature_api_log_views.xml",
+        "views/signature_webhook_event_views.xml",
         "views/contract_views.xml",
         "views/menu_views.xml",
     ],
@@ -27,13 +27,17 @@ class SignatureWebhookController(http.Controller):
         csrf=False,
     )
     def signature_callback(self, token, **kwargs):
-        """Webhook endpoint cho nhà cung cấp chữ ký số."""
+        """Webhook endpoint cho nhà cung cấp chữ ký số.
+
+        Callback được lưu vào hàng đợi và trả lời ngay; việc xử lý chạy
+        trong cron ``trasas.signature.webhook.event``.
+        """
         _logger.info("Signature callback received for token: %s", token)
 
         sig_request = (
             request.env["trasas.signature.request"]
             .sudo()
-            .search([("callback_token", "=", token)], limit=1)
+            ._get_by_callback_token(token)
         )
 
         if not sig_request:
@@ -48,20 +52,30 @@ class SignatureWebhookController(http.Controller):
             )
 
         try:
-            payload = request.jsonrequest
-            if payload is None:
-                raw = request.httprequest.data or b""
-                payload = json.loads(raw.decode("utf-8") or "{}")
-            sig_request._process_callback(payload)
-            return request.make_json_response({"status": "ok"})
+            raw = request.httprequest.get_data() or b""
+            payload = json.loads(raw.decode("utf-8") or "{}")
+        except ValueError:
+            return request.make_json_response(
+                {"status": "error", "message": "Invalid JSON"}, status=400
+            )
+
+        try:
+            queued = (
+                request.env["trasas.signature.webhook.event"]
+                .sudo()
+                ._enqueue(sig_request, token, payload)
+            )
         except Exception:
             _logger.exception(
-                "Error processing signature callback for %s",
+                "Error queuing signature callback for %s",
                 sig_request.name,
             )
             return request.make_json_response(
                 {"status": "error", "message": "Internal error"}, status=500
             )
+        return request.make_json_response(
+            {"status": "ok", "message": "Queued" if queued else "Duplicate"}
+        )
 
     @http.route(
         "/trasas/signature/demo/<string:token>/<int:signer_id>",
@@ -78,7 +92,7 @@ class SignatureWebhookController(http.Controller):
         sig_request = (
             request.env["trasas.signature.request"]
             .sudo()
-            .search([("callback_token", "=", token)], limit=1)
+            ._get_by_callback_token(token)
         )
 
         if not sig_request:
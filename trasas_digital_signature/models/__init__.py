@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 from . import signature_provider
 from . import signature_api_log
+from . import signature_api_stat
 from . import signature_signer
 from . import signature_request
+from . import signature_webhook_event
 from . import contract
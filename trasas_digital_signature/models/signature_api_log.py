@@ -1,14 +1,30 @@
 # -*- coding: utf-8 -*-
 import json
+import logging
+from datetime import timedelta
 
-from odoo import fields, models
+from odoo import SUPERUSER_ID, api, fields, models
+
+_logger = logging.getLogger(__name__)
 
 
 class TrasasSignatureApiLog(models.Model):
+    """Nhật ký call API nhà cung cấp chữ ký số.
+
+    Log được gom trong bộ nhớ suốt transaction (``_log_deferred``) và ghi 1
+    lần bằng cursor riêng khi transaction kết thúc - kể cả khi rollback, để
+    vẫn còn dấu vết của call lỗi.
+    """
+
     _name = "trasas.signature.api.log"
     _description = "Digital Signature API Log"
     _order = "create_date desc, id desc"
 
+    _BUFFER_KEY = "trasas_signature_api_log"
+    # Độ dài tối đa (ký tự) của payload log cũ sau khi rút gọn
+    _COMPACT_PAYLOAD_LENGTH = 1000
+    _COMPACT_SUFFIX = "\n... [rút gọn]"
+
     provider_id = fields.Many2one(
         "trasas.signature.provider",
         string="Nhà cung cấp",
@@ -25,6 +41,7 @@ class TrasasSignatureApiLog(models.Model):
         "trasas.signature.request",
         string="Yêu cầu ký",
         ondelete="set null",
+        index="btree_not_null",
     )
     signer_id = fields.Many2one(
         "trasas.signature.signer",
@@ -47,6 +64,20 @@ class TrasasSignatureApiLog(models.Model):
         default=lambda self: self.env.company,
     )
 
+    def init(self):
+        self.env.cr.execute(
+            """
+            CREATE INDEX IF NOT EXISTS trasas_signature_api_log_provider_create_date_idx
+            ON trasas_signature_api_log (provider_id, create_date)
+            """
+        )
+        self.env.cr.execute(
+            """
+            CREATE INDEX IF NOT EXISTS trasas_signature_api_log_create_date_idx
+            ON trasas_signature_api_log (create_date DESC, id DESC)
+            """
+        )
+
     def _set_request_payload(self, payload):
         self.ensure_one()
         if isinstance(payload, (dict, list)):
@@ -55,3 +86,114 @@ class TrasasSignatureApiLog(models.Model):
             )
         else:
             self.request_payload = str(payload or "")
+
+    @api.model
+    def _log_deferred(self, vals_list):
+        """Đưa log vào bộ đệm của transaction hiện tại.
+
+        ``request_payload``/``response_payload`` có thể là dict/list, được
+        chuyển sang JSON khi ghi. Bộ đệm được ghi sau commit hoặc rollback.
+        """
+        if not vals_list:
+            return
+        cr = self.env.cr
+        buffer = cr.postcommit.data.get(self._BUFFER_KEY)
+        if buffer is None:
+            buffer = cr.postcommit.data[self._BUFFER_KEY] = []
+            registry = self.env.registry
+            model_name = self._name
+
+            def flush():
+                entries = buffer[:]
+                buffer.clear()
+                if not entries:
+                    return
+                try:
+                    with registry.cursor() as log_cr:
+                        env = api.Environment(log_cr, SUPERUSER_ID, {})
+                        env[model_name]._write_entries(entries)
+                except Exception:
+                    _logger.exception("Failed to write %s signature API logs", len(entries))
+
+            # Chạy 1 trong 2 tùy transaction kết thúc thế nào
+            cr.postcommit.add(flush)
+            cr.postrollback.add(flush)
+        buffer.extend(vals_list)
+
+    @api.model
+    def _write_entries(self, vals_list):
+        """Ghi các log đã đệm bằng 1 lệnh create"""
+        # Yêu cầu/người ký có thể không còn nếu transaction gốc bị rollback
+        existing = {}
+        for field_name in ("request_id", "signer_id"):
+            comodel = self._fields[field_name].comodel_name
+            ids = {vals[field_name] for vals in vals_list if vals.get(field_name)}
+            existing[field_name] = set(self.env[comodel].browse(ids).exists().ids)
+
+        records = []
+        for vals in vals_list:
+            vals = dict(vals)
+            for field_name, ids in existing.items():
+                if vals.get(field_name) and vals[field_name] not in ids:
+                    vals[field_name] = False
+            for field_name in ("request_payload", "response_payload"):
+                value = vals.get(field_name)
+                if isinstance(value, (dict, list)):
+                    vals[field_name] = json.dumps(value, ensure_ascii=False, indent=2)
+            records.append(vals)
+        return self.create(records)
+
+    # ------------------------------------------------------------------
+    # Retention
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _cron_maintain_logs(self):
+        """Cron hằng ngày: tổng hợp thống kê, rút gọn payload cũ và xóa log
+        quá thời hạn lưu trữ của từng nhà cung cấp."""
+        self.env["trasas.signature.api.stat"]._aggregate_logs()
+        self.flush_model()
+        cr = self.env.cr
+        now = fields.Datetime.now()
+        # Payload sau khi rút gọn dài đúng ``limit`` ký tự (kể cả hậu tố)
+        # nên không bị chọn lại ở lần chạy sau
+        limit = self._COMPACT_PAYLOAD_LENGTH
+        suffix = self._COMPACT_SUFFIX
+        providers = self.env["trasas.signature.provider"].with_context(active_test=False).search([])
+        for provider in providers:
+            if provider.log_compact_days > 0:
+                cr.execute(
+                    """
+                    UPDATE trasas_signature_api_log
+                       SET request_payload = CASE WHEN length(request_payload) > %(limit)s
+                               THEN left(request_payload, %(keep)s) || %(suffix)s
+                               ELSE request_payload END,
+                           response_payload = CASE WHEN length(response_payload) > %(limit)s
+                               THEN left(response_payload, %(keep)s) || %(suffix)s
+                               ELSE response_payload END
+                     WHERE provider_id = %(provider)s
+                       AND create_date < %(cutoff)s
+                       AND (length(request_payload) > %(limit)s
+                            OR length(response_payload) > %(limit)s)
+                    """,
+                    {
+                        "limit": limit,
+                        "keep": limit - len(suffix),
+                        "suffix": suffix,
+                        "provider": provider.id,
+                        "cutoff": now - timedelta(days=provider.log_compact_days),
+                    },
+                )
+                if cr.rowcount:
+                    _logger.info("API log %s: %s payloads compacted", provider.name, cr.rowcount)
+            if provider.log_retention_days > 0:
+                cr.execute(
+                    """
+                    DELETE FROM trasas_signature_api_log
+                     WHERE provider_id = %s AND create_date < %s
+                    """,
+                    (provider.id, now - timedelta(days=provider.log_retention_days)),
+                )
+                if cr.rowcount:
+                    _logger.info("API log %s: %s records purged", provider.name, cr.rowcount)
+        self.invalidate_model()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+
+class TrasasSignatureApiStat(models.Model):
+    """Thống kê call API theo ngày - tổng hợp sẵn từ nhật ký API.
+
+    Dùng để xem nhanh tình trạng nhà cung cấp (số call, tỷ lệ lỗi, thời gian
+    phản hồi p50/p95) mà không phải quét bảng log, kể cả khi log cũ đã bị xóa
+    theo thời hạn lưu trữ.
+    """
+
+    _name = "trasas.signature.api.stat"
+    _description = "Thống kê API ký số theo ngày"
+    _order = "date desc, provider_id, operation"
+
+    date = fields.Date(string="Ngày", required=True, readonly=True, index=True)
+    provider_id = fields.Many2one(
+        "trasas.signature.provider",
+        string="Nhà cung cấp",
+        required=True,
+        readonly=True,
+        ondelete="cascade",
+    )
+    operation = fields.Char(string="Thao tác", readonly=True)
+    call_count = fields.Integer(string="Số call", readonly=True, aggregator="sum")
+    error_count = fields.Integer(string="Số lỗi", readonly=True, aggregator="sum")
+    error_rate = fields.Float(
+        string="Tỷ lệ lỗi (%)", readonly=True, digits=(5, 2), aggregator="avg"
+    )
+    duration_avg = fields.Float(
+        string="Thời gian TB (ms)", readonly=True, digits=(16, 1), aggregator="avg"
+    )
+    duration_p50 = fields.Float(
+        string="p50 (ms)", readonly=True, digits=(16, 1), aggregator="avg"
+    )
+    duration_p95 = fields.Float(
+        string="p95 (ms)", readonly=True, digits=(16, 1), aggregator="max"
+    )
+
+    def init(self):
+        self.env.cr.execute(
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS trasas_signature_api_stat_day_uniq
+            ON trasas_signature_api_stat (date, provider_id, operation)
+            """
+        )
+
+    @api.model
+    def _aggregate_logs(self):
+        """Tổng hợp các ngày đã qua chưa có thống kê (1 câu INSERT ... SELECT)"""
+        cr = self.env.cr
+        self.env["trasas.signature.api.log"].flush_model()
+        cr.execute("SELECT max(date) FROM trasas_signature_api_stat")
+        last_date = cr.fetchone()[0]
+        if last_date:
+            start = last_date + timedelta(days=1)
+        else:
+            cr.execute("SELECT min(create_date)::date FROM trasas_signature_api_log")
+            start = cr.fetchone()[0]
+        end = fields.Date.today()
+        if not start or start >= end:
+            return 0
+
+        cr.execute(
+            """
+            INSERT INTO trasas_signature_api_stat
+                (date, provider_id, operation, call_count, error_count,
+                 error_rate, duration_avg, duration_p50, duration_p95,
+                 create_uid, create_date, write_uid, write_date)
+            SELECT create_date::date,
+                   provider_id,
+                   COALESCE(operation, ''),
+                   count(*),
+                   count(*) FILTER (WHERE success IS NOT TRUE),
+                   round(100.0 * count(*) FILTER (WHERE success IS NOT TRUE) / count(*), 2),
+                   avg(duration_ms),
+                   percentile_cont(0.5) WITHIN GROUP (ORDER BY duration_ms),
+                   percentile_cont(0.95) WITHIN GROUP (ORDER BY duration_ms),
+                   %(uid)s, (now() at time zone 'UTC'),
+                   %(uid)s, (now() at time zone 'UTC')
+              FROM trasas_signature_api_log
+             WHERE create_date >= %(start)s AND create_date < %(end)s
+          GROUP BY 1, 2, 3
+            ON CONFLICT (date, provider_id, operation) DO UPDATE
+               SET call_count = EXCLUDED.call_count,
+                   error_count = EXCLUDED.error_count,
+                   error_rate = EXCLUDED.error_rate,
+                   duration_avg = EXCLUDED.duration_avg,
+                   duration_p50 = EXCLUDED.duration_p50,
+                   duration_p95 = EXCLUDED.duration_p95,
+                   write_uid = EXCLUDED.write_uid,
+                   write_date = EXCLUDED.write_date
+            """,
+            {"uid": self.env.uid, "start": start, "end": end},
+        )
+        self.invalidate_model()
+        return cr.rowcount
@@ -1,20 +1,272 @@
 # -*- coding: utf-8 -*-
+import hashlib
 import logging
+import random
 import uuid
 import re
 import time
+import threading
 import requests
-import base64
 import json
 import io
 import zipfile
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 
-from odoo import _, api, fields, models
+from requests.adapters import HTTPAdapter
+
+from odoo import SUPERUSER_ID, _, api, fields, models
 from odoo.exceptions import UserError
 
 _logger = logging.getLogger(__name__)
 
+# Session HTTP dùng lại trong worker: {(db, provider_id): (pool_size, Session)}
+_HTTP_SESSIONS = {}
+_HTTP_SESSIONS_LOCK = threading.Lock()
+
+# Mã HTTP tạm thời - được retry với các call idempotent
+_HTTP_RETRY_STATUSES = (429, 502, 503, 504)
+
+_SMARTCA_CERT_PATH = "/v1/credentials/get_certificate"
+_SMARTCA_SIGN_PATH = "/v1/signatures/sign"
+
+
+class _RateLimiter:
+    """Giới hạn số call/giây, dùng chung giữa các thread của 1 nhà cung cấp"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_at = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            at = max(self.next_at, now)
+            self.next_at = at + self.interval
+        if at > now:
+            time.sleep(at - now)
+
+
+# {(db, provider_id, rate): _RateLimiter}
+_RATE_LIMITERS = {}
+
+
+def _http_pool_stats(session):
+    """Thống kê tái sử dụng kết nối của session (theo urllib3 connection pool)"""
+    calls = connections = 0
+    for adapter in set(session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            calls += pool.num_requests
+            connections += pool.num_connections
+    return {
+        "requests": calls,
+        "connections": connections,
+        "reused": max(calls - connections, 0),
+        "reuse_ratio": round(1 - connections / calls, 3) if calls else 0.0,
+    }
+
+
+def _http_send(http, method, url, **kwargs):
+    """Gửi request theo ``http`` (xem ``_get_http_options``), thử lại với
+    backoff lũy thừa khi còn lượt retry. Không dùng ORM (an toàn trong thread)."""
+    attempt = 0
+    while True:
+        try:
+            resp = http["session"].request(
+                method, url, timeout=http["timeout"], **kwargs
+            )
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt >= http["retries"]:
+                raise
+            _logger.info("HTTP %s %s failed (%s), retry %s", method, url, e, attempt + 1)
+        else:
+            if resp.status_code not in _HTTP_RETRY_STATUSES or attempt >= http["retries"]:
+                return resp
+            _logger.info(
+                "HTTP %s %s returned %s, retry %s", method, url, resp.status_code, attempt + 1
+            )
+        time.sleep(http["backoff"] * (2**attempt))
+        attempt += 1
+
+
+def _smartca_exchange(http, url, headers, payload):
+    """Gửi 1 call POST đến SmartCA và phân loại kết quả (không dùng ORM).
+
+    Returns:
+        dict: url, status_code, duration_ms, success, data, response_payload,
+        text, error_message và error (False | 'network' | 'http' | 'json' | 'app')
+    """
+    outcome = {
+        "url": url,
+        "status_code": 0,
+        "duration_ms": 0,
+        "success": False,
+        "data": None,
+        "response_payload": "",
+        "text": "",
+        "error_message": "",
+        "error": False,
+        "app_status": None,
+    }
+    started = time.monotonic()
+    try:
+        resp = _http_send(http, "POST", url, headers=headers, json=payload)
+    except requests.RequestException as e:
+        outcome.update(
+            duration_ms=int((time.monotonic() - started) * 1000),
+            error_message=str(e),
+            error="network",
+        )
+        return outcome
+
+    outcome.update(
+        duration_ms=int((time.monotonic() - started) * 1000),
+        status_code=resp.status_code,
+        text=resp.text,
+    )
+    try:
+        data = resp.json()
+        json_error = None
+    except Exception as e:
+        data = None
+        json_error = e
+
+    if resp.status_code >= 400:
+        outcome.update(
+            response_payload=resp.text if json_error else data,
+            error_message=resp.text or "",
+            error="http",
+        )
+        return outcome
+    if json_error:
+        outcome.update(
+            response_payload=resp.text, error_message=str(json_error), error="json"
+        )
+        return outcome
+
+    app_status = data.get("status_code") if isinstance(data, dict) else None
+    app_message = (data.get("message") or "") if isinstance(data, dict) else ""
+    app_status_int = None
+    if app_status is not None:
+        try:
+            app_status_int = int(app_status)
+        except (TypeError, ValueError):
+            app_status_int = None
+    outcome.update(data=data, response_payload=data)
+    if app_status_int is not None and app_status_int != 200:
+        outcome.update(
+            error_message=app_message or resp.text or "",
+            error="app",
+            app_status=app_status,
+        )
+        return outcome
+    outcome["success"] = True
+    return outcome
+
+
+def _smartca_extract_serial(data):
+    """Lấy serial chứng thư từ phản hồi get_certificate"""
+    payload_data = data.get("data") if isinstance(data, dict) else {}
+    serial = ""
+    certs = []
+    if isinstance(payload_data, dict):
+        serial = (
+            payload_data.get("serial_number")
+            or payload_data.get("serialNumber")
+            or payload_data.get("cert_serial")
+            or ""
+        )
+        certs = (
+            payload_data.get("user_certificates")
+            or payload_data.get("certificates")
+            or payload_data.get("userCertificates")
+            or []
+        )
+    elif isinstance(payload_data, list):
+        certs = payload_data
+
+    if not serial and certs and isinstance(certs, list):
+        first = certs[0] or {}
+        if isinstance(first, dict):
+            serial = (
+                first.get("serial_number")
+                or first.get("serialNumber")
+                or first.get("cert_serial")
+                or ""
+            )
+    if not serial and isinstance(data, dict):
+        serial = (
+            data.get("serial_number")
+            or data.get("serialNumber")
+            or data.get("cert_serial")
+            or ""
+        )
+    return serial
+
+
+def _status_fingerprint(*values):
+    """Dấu vân tay trạng thái người ký (các giá trị trích từ phản hồi NCC)"""
+    raw = json.dumps(values, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _smartca_tran_not_exist(outcome):
+    return "sig_tran_not_exist" in (outcome["error_message"] or "") or (
+        "sig_tran_not_exist" in (outcome["text"] or "")
+    )
+
+
+def _smartca_status_job(http, base_url, headers, candidates, payload, limiter, deadline):
+    """Hỏi trạng thái 1 người ký, thử lần lượt các mã giao dịch (không dùng ORM).
+
+    Returns:
+        tuple: (calls, state) - state là 'done' (có phản hồi hợp lệ),
+        'not_found' (mọi mã đều sig_tran_not_exist), 'error' hoặc 'timeout'
+    """
+    calls = []
+    for tran in candidates:
+        if deadline and time.monotonic() >= deadline:
+            return calls, "timeout"
+        limiter.wait()
+        path = f"/v1/signatures/sign/{tran}/status"
+        outcome = _smartca_exchange(http, base_url + path, headers, payload)
+        calls.append((path, "status", payload, outcome))
+        if not outcome["error"]:
+            return calls, "done"
+        if not _smartca_tran_not_exist(outcome):
+            return calls, "error"
+    return calls, "not_found"
+
+
+def _smartca_sign_job(cert_http, sign_http, base_url, headers, cert_payload, sign_payload):
+    """Pha HTTP của 1 người ký: lấy chứng thư (nếu cần) rồi tạo giao dịch ký.
+    Không dùng ORM, chạy được trong thread.
+
+    Returns:
+        list[tuple]: (endpoint, operation, payload, outcome) theo thứ tự gọi
+    """
+    calls = []
+    if cert_payload:
+        outcome = _smartca_exchange(
+            cert_http, base_url + _SMARTCA_CERT_PATH, headers, cert_payload
+        )
+        calls.append((_SMARTCA_CERT_PATH, "get_certificate", cert_payload, outcome))
+        serial = _smartca_extract_serial(outcome["data"]) if outcome["success"] else ""
+        if serial:
+            sign_payload = dict(sign_payload, serial_number=serial)
+    outcome = _smartca_exchange(
+        sign_http, base_url + _SMARTCA_SIGN_PATH, headers, sign_payload
+    )
+    calls.append((_SMARTCA_SIGN_PATH, "sign", sign_payload, outcome))
+    return calls
+
 
 class TrasasSignatureProvider(models.Model):
     """
@@ -70,6 +322,63 @@ class TrasasSignatureProvider(models.Model):
         compute="_compute_request_count",
     )
 
+    # HTTP client
+    http_pool_size = fields.Integer(
+        string="Số kết nối tối đa",
+        default=10,
+        help="Số kết nối keep-alive giữ lại cho mỗi nhà cung cấp trong một worker",
+    )
+    http_connect_timeout = fields.Integer(
+        string="Timeout kết nối (giây)",
+        default=10,
+    )
+    http_timeout = fields.Integer(
+        string="Timeout phản hồi (giây)",
+        default=30,
+    )
+    http_max_retries = fields.Integer(
+        string="Số lần thử lại",
+        default=3,
+        help="Chỉ áp dụng cho các call idempotent (kiểm tra trạng thái, chứng thư)",
+    )
+    http_backoff_factor = fields.Float(
+        string="Hệ số backoff (giây)",
+        default=0.5,
+        help="Thời gian chờ trước lần thử lại thứ n = hệ số * 2^(n-1)",
+    )
+    concurrent_send = fields.Boolean(
+        string="Gửi song song",
+        default=True,
+        help="Tạo giao dịch ký cho các người ký song song (giới hạn bởi số kết nối tối đa)",
+    )
+    log_payload_sample_rate = fields.Float(
+        string="Tỷ lệ lưu payload",
+        default=1.0,
+        help="Tỷ lệ (0-1) call thành công được lưu đầy đủ request/response vào log API. "
+        "Call lỗi luôn được lưu đầy đủ.",
+    )
+    log_compact_days = fields.Integer(
+        string="Rút gọn payload sau (ngày)",
+        default=7,
+        help="Payload của log API cũ hơn số ngày này được rút gọn. 0 = không rút gọn",
+    )
+    log_retention_days = fields.Integer(
+        string="Lưu log API (ngày)",
+        default=90,
+        help="Log API cũ hơn số ngày này bị xóa (thống kê theo ngày vẫn được giữ). 0 = giữ mãi",
+    )
+    status_rate_limit = fields.Float(
+        string="Giới hạn hỏi trạng thái (call/giây)",
+        default=5.0,
+        help="Số call kiểm tra trạng thái tối đa mỗi giây gửi đến nhà cung cấp. 0 = không giới hạn",
+    )
+    vnpt_transaction_ttl = fields.Integer(
+        string="Hiệu lực giao dịch SmartCA (phút)",
+        default=5,
+        help="Giao dịch ký giữ lại từ lần gửi lỗi chỉ được dùng lại trong thời gian này; "
+        "quá hạn thì tạo giao dịch mới (người ký nhận thông báo mới trên ứng dụng SmartCA)",
+    )
+
     # ------------------------------------------------------------------
     # Selection helpers
     # ------------------------------------------------------------------
@@ -193,13 +502,47 @@ class TrasasSignatureProvider(models.Model):
                     'provider_signer_ref': str,
                     'status': 'waiting'|'signed'|'refused',
                     'signed_date': datetime|False,
-                }]
+                }],
+                'unchanged': bool (tùy chọn) - True nếu NCC không có gì mới
+                    kể từ lần kiểm tra trước
             }
         """
         return self._call_provider("get_status", request)
 
+    def _provider_get_status_batch(self, sig_requests, deadline=None):
+        """
+        Kiểm tra trạng thái nhiều yêu cầu ký của nhà cung cấp (dùng cho cron).
+
+        Provider có thể implement _{type}_get_status_batch() để gọi song song;
+        mặc định gọi lần lượt _provider_get_status().
+
+        Args:
+            deadline (float): time.monotonic() phải dừng; yêu cầu chưa kịp
+                kiểm tra không có trong kết quả
+
+        Returns:
+            dict: {request_id: dict trạng thái | Exception}
+        """
+        self.ensure_one()
+        method_name = f"_{self.provider_type}_get_status_batch"
+        if hasattr(self, method_name):
+            return getattr(self, method_name)(sig_requests, deadline=deadline)
+        results = {}
+        for request in sig_requests:
+            if deadline and time.monotonic() >= deadline:
+                break
+            try:
+                results[request.id] = self._provider_get_status(request)
+            except Exception as e:
+                results[request.id] = e
+        return results
+
     def _provider_download_signed(self, request):
-        """Tải tài liệu đã ký. Returns: base64 encoded file."""
+        """Tải tài liệu đã ký.
+
+        Returns: base64 encoded file, hoặc ir.attachment của trường
+        signed_document nếu provider đã ghi thẳng file vào filestore.
+        """
         return self._call_provider("download_signed", request)
 
     def _provider_cancel(self, request):
@@ -214,6 +557,78 @@ class TrasasSignatureProvider(models.Model):
         )
         return True
 
+    # ------------------------------------------------------------------
+    # HTTP client (pooled, keep-alive)
+    # ------------------------------------------------------------------
+
+    def _get_http_session(self):
+        """Session HTTP keep-alive của nhà cung cấp, dùng lại giữa các call
+        trong cùng worker để không phải bắt tay TCP/TLS lại mỗi lần."""
+        self.ensure_one()
+        pool_size = max(self.http_pool_size or 10, 1)
+        key = (self.env.cr.dbname, self.id)
+        entry = _HTTP_SESSIONS.get(key)
+        if entry is None or entry[0] != pool_size:
+            with _HTTP_SESSIONS_LOCK:
+                entry = _HTTP_SESSIONS.get(key)
+                if entry is None or entry[0] != pool_size:
+                    # Đổi số kết nối tối đa: đóng session cũ (và các kết nối
+                    # đang giữ) rồi tạo session mới
+                    if entry is not None:
+                        entry[1].close()
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=4, pool_maxsize=pool_size, max_retries=0
+                    )
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    entry = _HTTP_SESSIONS[key] = (pool_size, session)
+        return entry[1]
+
+    def _get_http_timeout(self, timeout=None):
+        """(connect, read) timeout cho requests"""
+        self.ensure_one()
+        return (
+            self.http_connect_timeout or 10,
+            timeout or self.http_timeout or 30,
+        )
+
+    def _get_http_options(self, idempotent=False, timeout=None):
+        """Tham số gửi request (session, timeout, retry) - đọc 1 lần trên
+        thread chính để có thể gửi song song mà không đụng ORM."""
+        self.ensure_one()
+        return {
+            "session": self._get_http_session(),
+            "timeout": self._get_http_timeout(timeout),
+            "retries": max(self.http_max_retries or 0, 0) if idempotent else 0,
+            "backoff": self.http_backoff_factor or 0.0,
+        }
+
+    def _http_request(self, method, url, idempotent=False, timeout=None, **kwargs):
+        """Gửi request qua session dùng chung.
+
+        Call idempotent được thử lại tối đa ``http_max_retries`` lần khi lỗi
+        mạng hoặc gateway trả 429/502/503/504, chờ theo backoff lũy thừa.
+        """
+        return _http_send(
+            self._get_http_options(idempotent, timeout), method, url, **kwargs
+        )
+
+    def _get_rate_limiter(self):
+        """Bộ giới hạn tốc độ của nhà cung cấp, dùng chung trong worker"""
+        self.ensure_one()
+        key = (self.env.cr.dbname, self.id, self.status_rate_limit or 0)
+        with _HTTP_SESSIONS_LOCK:
+            limiter = _RATE_LIMITERS.get(key)
+            if limiter is None:
+                limiter = _RATE_LIMITERS[key] = _RateLimiter(self.status_rate_limit)
+        return limiter
+
+    def _http_stats(self):
+        """Thống kê tái sử dụng kết nối của session trong worker hiện tại"""
+        self.ensure_one()
+        return _http_pool_stats(self._get_http_session())
+
     # ==================================================================
     # DEMO PROVIDER IMPLEMENTATION
     # ==================================================================
@@ -235,9 +650,9 @@ class TrasasSignatureProvider(models.Model):
                         f"{base_url}/trasas/signature/demo/"
                         f"{request.callback_token}/{signer.id}"
                     ),
-                    "provider_signer_ref": (
-                        f"DEMO-SIGNER-{uuid.uuid4().hex[:6].upper()}"
-                    ),
+                    # uuid đầy đủ: cột có unique index, 6 ký tự hex sẽ trùng
+                    # khi có vài nghìn người ký
+                    "provider_signer_ref": f"DEMO-SIGNER-{uuid.uuid4().hex.upper()}",
                 }
             )
         return result
@@ -336,234 +751,124 @@ class TrasasSignatureProvider(models.Model):
             safe["sign_files"] = safe_files
         return safe
 
-    def _vnpt_smartca_log_api(
-        self,
-        *,
-        request,
-        signer,
-        operation,
-        method,
-        endpoint,
-        url,
-        status_code,
-        success,
-        duration_ms,
-        payload,
-        response_payload,
-        error_message=None,
+    def _vnpt_smartca_log_vals(
+        self, *, request, signer, operation, endpoint, payload, outcome
     ):
-        vals = {
+        """Giá trị 1 dòng trasas.signature.api.log từ kết quả ``_smartca_exchange``.
+
+        Payload chỉ được lưu đầy đủ khi call lỗi hoặc theo tỷ lệ lấy mẫu
+        ``log_payload_sample_rate``; JSON được tạo lúc ghi log.
+        """
+        capture = not outcome["success"] or random.random() < self.log_payload_sample_rate
+        response_payload = outcome["response_payload"]
+        if not capture:
+            request_payload = response_payload = ""
+        elif payload is not None:
+            request_payload = self._vnpt_smartca_sanitize_payload(payload)
+        else:
+            request_payload = ""
+        return {
             "provider_id": self.id,
             "request_id": request.id if request else False,
             "signer_id": signer.id if signer else False,
             "operation": operation or "",
-            "method": method or "POST",
+            "method": "POST",
             "endpoint": endpoint or "",
-            "url": url or "",
-            "status_code": status_code or 0,
-            "success": bool(success),
-            "duration_ms": duration_ms or 0,
-            "request_payload": json.dumps(
-                self._vnpt_smartca_sanitize_payload(payload),
-                ensure_ascii=False,
-                indent=2,
-            )
-            if payload is not None
-            else "",
-            "response_payload": json.dumps(
-                response_payload, ensure_ascii=False, indent=2
-            )
-            if isinstance(response_payload, (dict, list))
-            else (response_payload or ""),
-            "error_message": error_message or "",
+            "url": outcome["url"] or "",
+            "status_code": outcome["status_code"] or 0,
+            "success": bool(outcome["success"]),
+            "duration_ms": outcome["duration_ms"] or 0,
+            "request_payload": request_payload,
+            "response_payload": response_payload or "",
+            "error_message": outcome["error_message"] or "",
             "company_id": self.company_id.id or False,
         }
-        try:
-            self.env["trasas.signature.api.log"].sudo().create(vals)
-        except Exception:
-            _logger.exception("Failed to write SmartCA API log")
 
-    def _vnpt_smartca_post(
-        self, path, payload, timeout=30, request=None, signer=None, operation=None
-    ):
-        self.ensure_one()
-        url = f"{self._vnpt_smartca_base_url()}{path}"
-        _logger.info("SmartCA POST %s", url)
-        started = time.monotonic()
-        try:
-            resp = requests.post(
-                url,
-                headers=self._vnpt_smartca_headers(),
-                json=payload,
-                timeout=timeout,
-            )
-        except requests.RequestException as e:
-            duration_ms = int((time.monotonic() - started) * 1000)
-            self._vnpt_smartca_log_api(
-                request=request,
-                signer=signer,
-                operation=operation,
-                method="POST",
-                endpoint=path,
-                url=url,
-                status_code=0,
-                success=False,
-                duration_ms=duration_ms,
-                payload=payload,
-                response_payload="",
-                error_message=str(e),
-            )
-            raise UserError(_("SmartCA network error: %s") % str(e))
-
-        duration_ms = int((time.monotonic() - started) * 1000)
-        response_payload = None
-        try:
-            response_payload = resp.json()
-        except Exception:
-            response_payload = resp.text
-
-        if resp.status_code >= 400:
+    def _vnpt_smartca_log_api(self, vals_list):
+        """Ghi log API (gom lại, ghi 1 lần khi transaction kết thúc)"""
+        self.env["trasas.signature.api.log"].sudo()._log_deferred(vals_list)
+
+    def _vnpt_smartca_check_outcome(self, outcome, payload):
+        """Trả về dữ liệu JSON nếu call thành công, ngược lại raise UserError"""
+        error = outcome["error"]
+        if not error:
+            return outcome["data"]
+        if error == "network":
+            raise UserError(_("SmartCA network error: %s") % outcome["error_message"])
+        if error == "http":
             _logger.warning(
                 "SmartCA error %s. Payload=%s",
-                resp.status_code,
+                outcome["status_code"],
                 self._vnpt_smartca_sanitize_payload(payload),
             )
-            self._vnpt_smartca_log_api(
-                request=request,
-                signer=signer,
-                operation=operation,
-                method="POST",
-                endpoint=path,
-                url=url,
-                status_code=resp.status_code,
-                success=False,
-                duration_ms=duration_ms,
-                payload=payload,
-                response_payload=response_payload,
-                error_message=resp.text or "",
-            )
             raise UserError(
-                _("SmartCA HTTP %s: %s (URL: %s)") % (resp.status_code, resp.text, url)
-            )
-        try:
-            data = resp.json()
-        except Exception as e:
-            self._vnpt_smartca_log_api(
-                request=request,
-                signer=signer,
-                operation=operation,
-                method="POST",
-                endpoint=path,
-                url=url,
-                status_code=resp.status_code,
-                success=False,
-                duration_ms=duration_ms,
-                payload=payload,
-                response_payload=resp.text,
-                error_message=str(e),
-            )
-            raise UserError(_("SmartCA response is not JSON: %s") % resp.text)
-        app_status = None
-        app_message = ""
-        if isinstance(data, dict):
-            app_status = data.get("status_code")
-            app_message = data.get("message") or ""
-        app_status_int = None
-        if app_status is not None:
-            try:
-                app_status_int = int(app_status)
-            except (TypeError, ValueError):
-                app_status_int = None
-        if app_status_int is not None and app_status_int != 200:
-            self._vnpt_smartca_log_api(
-                request=request,
-                signer=signer,
-                operation=operation,
-                method="POST",
-                endpoint=path,
-                url=url,
-                status_code=resp.status_code,
-                success=False,
-                duration_ms=duration_ms,
-                payload=payload,
-                response_payload=data,
-                error_message=app_message or resp.text or "",
-            )
-            raise UserError(
-                _("SmartCA error %s: %s") % (app_status, app_message or resp.text)
+                _("SmartCA HTTP %s: %s (URL: %s)")
+                % (outcome["status_code"], outcome["text"], outcome["url"])
             )
+        if error == "json":
+            raise UserError(_("SmartCA response is not JSON: %s") % outcome["text"])
+        raise UserError(
+            _("SmartCA error %s: %s") % (outcome["app_status"], outcome["error_message"])
+        )
+
+    def _vnpt_smartca_post(
+        self,
+        path,
+        payload,
+        timeout=None,
+        request=None,
+        signer=None,
+        operation=None,
+        idempotent=False,
+    ):
+        self.ensure_one()
+        url = f"{self._vnpt_smartca_base_url()}{path}"
+        _logger.info("SmartCA POST %s", url)
+        outcome = _smartca_exchange(
+            self._get_http_options(idempotent, timeout),
+            url,
+            self._vnpt_smartca_headers(),
+            payload,
+        )
         self._vnpt_smartca_log_api(
-            request=request,
-            signer=signer,
-            operation=operation,
-            method="POST",
-            endpoint=path,
-            url=url,
-            status_code=resp.status_code,
-            success=True,
-            duration_ms=duration_ms,
-            payload=payload,
-            response_payload=data,
-            error_message="",
+            [
+                self._vnpt_smartca_log_vals(
+                    request=request,
+                    signer=signer,
+                    operation=operation,
+                    endpoint=path,
+                    payload=payload,
+                    outcome=outcome,
+                )
+            ]
         )
-        return data
+        return self._vnpt_smartca_check_outcome(outcome, payload)
 
     def _vnpt_smartca_get_certificate(self, signer, transaction_id, request=None):
         """Fetch certificate info to derive serial_number when missing."""
         self.ensure_one()
-        payload = {
-            "sp_id": self._vnpt_smartca_payload_sp_id(),
-            "sp_password": self.api_secret,
-            "user_id": signer.id_number or "",
-            "serial_number": signer.vnpt_serial_number or "",
-            "transaction_id": transaction_id,
-        }
         data = self._vnpt_smartca_post(
-            "/v1/credentials/get_certificate",
-            payload,
+            _SMARTCA_CERT_PATH,
+            self._vnpt_smartca_certificate_payload(signer, transaction_id),
             request=request,
             signer=signer,
             operation="get_certificate",
+            idempotent=True,
         )
-        payload_data = data.get("data") if isinstance(data, dict) else {}
-        serial = ""
-        certs = []
-        if isinstance(payload_data, dict):
-            serial = (
-                payload_data.get("serial_number")
-                or payload_data.get("serialNumber")
-                or payload_data.get("cert_serial")
-                or ""
-            )
-            certs = (
-                payload_data.get("user_certificates")
-                or payload_data.get("certificates")
-                or payload_data.get("userCertificates")
-                or []
-            )
-        elif isinstance(payload_data, list):
-            certs = payload_data
-
-        if not serial and certs and isinstance(certs, list):
-            first = certs[0] or {}
-            if isinstance(first, dict):
-                serial = (
-                    first.get("serial_number")
-                    or first.get("serialNumber")
-                    or first.get("cert_serial")
-                    or ""
-                )
-        if not serial and isinstance(data, dict):
-            serial = (
-                data.get("serial_number")
-                or data.get("serialNumber")
-                or data.get("cert_serial")
-                or ""
-            )
+        serial = _smartca_extract_serial(data)
         if serial:
             signer.write({"vnpt_serial_number": serial})
         return data
 
+    def _vnpt_smartca_certificate_payload(self, signer, transaction_id):
+        return {
+            "sp_id": self._vnpt_smartca_payload_sp_id(),
+            "sp_password": self.api_secret,
+            "user_id": signer.id_number or "",
+            "serial_number": signer.vnpt_serial_number or "",
+            "transaction_id": transaction_id,
+        }
+
     def _vnpt_smartca_test_connection(self):
         """Validate credentials + basic reachability of the gateway."""
         self.ensure_one()
@@ -572,7 +877,7 @@ class TrasasSignatureProvider(models.Model):
 
         base_url = self._vnpt_smartca_base_url().rstrip("/") + "/"
         try:
-            resp = requests.request("GET", base_url, timeout=10)
+            resp = self._http_request("GET", base_url, idempotent=True)
         except requests.RequestException as e:
             raise UserError(
                 _("Không kết nối được đến gateway: %s\n%s") % (base_url, str(e))
@@ -585,14 +890,32 @@ class TrasasSignatureProvider(models.Model):
                 % (resp.status_code, base_url),
             }
 
+        stats = self._http_stats()
         return {
             "ok": True,
-            "message": _("Gateway reachable (%s) tại %s")
-            % (resp.status_code, base_url),
+            "message": _(
+                "Gateway reachable (%s) tại %s\n"
+                "Kết nối: %s request / %s kết nối mới (tái sử dụng %s%%)"
+            )
+            % (
+                resp.status_code,
+                base_url,
+                stats["requests"],
+                stats["connections"],
+                int(stats["reuse_ratio"] * 100),
+            ),
         }
 
     def _vnpt_smartca_send_document(self, request):
-        """Create SmartCA signing transaction per signer (hash signing)."""
+        """Create SmartCA signing transaction per signer (hash signing).
+
+        Pha HTTP (lấy chứng thư + tạo giao dịch ký) của các người ký chạy song
+        song trong thread pool khi bật ``concurrent_send``; log API và cập nhật
+        người ký được ghi sau đó trên thread chính, trong 1 lượt.
+
+        Nếu 1 người ký lỗi, giao dịch đã tạo của những người ký khác vẫn được
+        lưu (kể cả khi transaction bị rollback) và được dùng lại ở lần gửi sau.
+        """
         self.ensure_one()
         if not self.api_key or not self.api_secret:
             raise UserError(_("Thiếu SP ID / SP Password (API Key/Secret)."))
@@ -600,16 +923,31 @@ class TrasasSignatureProvider(models.Model):
         if not request.hash_hex:
             request._prepare_hash_for_signing()
 
-        batch_ref = f"SMARTCA-{uuid.uuid4().hex[:10].upper()}"
-        result = {"provider_document_ref": batch_ref, "signers": []}
+        signers = request.signer_ids.sorted("sign_order")
+        missing = signers.filtered(lambda s: not s.id_number)
+        if missing:
+            raise UserError(
+                _("Thiếu 'Định danh ký (CCCD/MST)' cho người ký: %s")
+                % (missing[0].signer_name or missing[0].id)
+            )
 
-        for signer in request.signer_ids.sorted("sign_order"):
-            if not signer.id_number:
-                raise UserError(
-                    _("Thiếu 'Định danh ký (CCCD/MST)' cho người ký: %s")
-                    % (signer.signer_name or signer.id)
-                )
+        base_url = self._vnpt_smartca_base_url()
+        headers = self._vnpt_smartca_headers()
+        cert_http = self._get_http_options(idempotent=True)
+        sign_http = self._get_http_options()
+        transaction_desc = (
+            request.contract_id.name if request.contract_id else request.name
+        )
 
+        jobs = []
+        # Chỉ dùng lại giao dịch còn hiệu lực phía SmartCA
+        fresh_after = fields.Datetime.now() - timedelta(minutes=self.vnpt_transaction_ttl)
+        reused = signers.filtered(
+            lambda s: s.vnpt_tran_code
+            and s.vnpt_tran_date
+            and s.vnpt_tran_date > fresh_after
+        )
+        for signer in signers - reused:
             transaction_id = self._vnpt_smartca_safe_code(
                 f"{request.name}-{signer.id}-{uuid.uuid4().hex[:6]}",
                 max_len=64,
@@ -618,27 +956,17 @@ class TrasasSignatureProvider(models.Model):
                 f"{request.name}-{signer.id}",
                 max_len=64,
             )
-
+            cert_payload = None
             if not signer.vnpt_serial_number:
-                try:
-                    self._vnpt_smartca_get_certificate(
-                        signer, transaction_id, request=request
-                    )
-                except Exception as e:
-                    _logger.warning(
-                        "SmartCA get_certificate failed for %s: %s",
-                        signer.signer_name or signer.id,
-                        e,
-                    )
-
-            payload = {
+                cert_payload = self._vnpt_smartca_certificate_payload(
+                    signer, transaction_id
+                )
+            sign_payload = {
                 "sp_id": self._vnpt_smartca_payload_sp_id(),
                 "sp_password": self.api_secret,
                 "user_id": signer.id_number,
                 "transaction_id": transaction_id,
-                "transaction_desc": (
-                    request.contract_id.name if request.contract_id else request.name
-                ),
+                "transaction_desc": transaction_desc,
                 "time_stamp": datetime.utcnow().strftime("%Y%m%d%H%M%SZ"),
                 "sign_files": [
                     {
@@ -650,16 +978,83 @@ class TrasasSignatureProvider(models.Model):
                 ],
             }
             if signer.vnpt_serial_number:
-                payload["serial_number"] = signer.vnpt_serial_number
-
-            data = self._vnpt_smartca_post(
-                "/v1/signatures/sign",
-                payload,
-                request=request,
-                signer=signer,
-                operation="sign",
+                sign_payload["serial_number"] = signer.vnpt_serial_number
+            jobs.append(
+                (
+                    signer,
+                    transaction_id,
+                    (cert_http, sign_http, base_url, headers, cert_payload, sign_payload),
+                )
             )
 
+        _logger.info(
+            "SmartCA send %s: %s signers (%s)",
+            request.name,
+            len(jobs),
+            "concurrent" if self.concurrent_send and len(jobs) > 1 else "sequential",
+        )
+        if self.concurrent_send and len(jobs) > 1:
+            workers = min(len(jobs), max(self.http_pool_size or 10, 1))
+            with ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="smartca"
+            ) as executor:
+                futures = [executor.submit(_smartca_sign_job, *args) for _s, _t, args in jobs]
+                # Lấy kết quả của mọi job, kể cả khi 1 job lỗi
+                results = []
+                for future in futures:
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        results.append(e)
+        else:
+            results = [_smartca_sign_job(*args) for _s, _t, args in jobs]
+
+        # Ghi log API của mọi call trong 1 lần
+        self._vnpt_smartca_log_api(
+            [
+                self._vnpt_smartca_log_vals(
+                    request=request,
+                    signer=signer,
+                    operation=operation,
+                    endpoint=endpoint,
+                    payload=payload,
+                    outcome=outcome,
+                )
+                for (signer, _t, _a), calls in zip(jobs, results)
+                if not isinstance(calls, Exception)
+                for endpoint, operation, payload, outcome in calls
+            ]
+        )
+
+        batch_ref = f"SMARTCA-{uuid.uuid4().hex[:10].upper()}"
+        result = {"provider_document_ref": batch_ref, "signers": []}
+        sent = []
+        errors = []
+        for (signer, transaction_id, _a), calls in zip(jobs, results):
+            if isinstance(calls, Exception):
+                errors.append(UserError(_("SmartCA error: %s") % calls))
+                continue
+            vals = {}
+            if len(calls) > 1:
+                cert_outcome = calls[0][3]
+                if cert_outcome["success"]:
+                    serial = _smartca_extract_serial(cert_outcome["data"])
+                    if serial:
+                        vals["vnpt_serial_number"] = serial
+                else:
+                    _logger.warning(
+                        "SmartCA get_certificate failed for %s: %s",
+                        signer.signer_name or signer.id,
+                        cert_outcome["error_message"],
+                    )
+
+            _endpoint, _operation, payload, outcome = calls[-1]
+            try:
+                data = self._vnpt_smartca_check_outcome(outcome, payload)
+            except UserError as e:
+                errors.append(e)
+                continue
+
             payload_data = data.get("data") if isinstance(data, dict) else {}
             tran_code = (
                 (
@@ -685,10 +1080,11 @@ class TrasasSignatureProvider(models.Model):
 
             status_code = data.get("status_code") if isinstance(data, dict) else None
             message = data.get("message") if isinstance(data, dict) else None
-            signer.write(
+            vals.update(
                 {
                     "vnpt_transaction_id": transaction_id,
                     "vnpt_tran_code": tran_code,
+                    "vnpt_tran_date": fields.Datetime.now(),
                     "provider_signer_ref": tran_code or transaction_id,
                     "vnpt_last_status": str(
                         status_code
@@ -702,7 +1098,15 @@ class TrasasSignatureProvider(models.Model):
                     ),
                 }
             )
+            sent.append((signer, vals))
+
+        if errors:
+            self._vnpt_smartca_keep_transactions(sent)
+            raise errors[0]
 
+        for signer, vals in sent:
+            signer.write(vals)
+        for signer in signers:
             result["signers"].append(
                 {
                     "signer_id": signer.id,
@@ -713,14 +1117,51 @@ class TrasasSignatureProvider(models.Model):
 
         return result
 
+    def _vnpt_smartca_keep_transactions(self, sent):
+        """Lưu giao dịch SmartCA đã tạo khi lần gửi lỗi giữa chừng.
+
+        Ghi ngay bằng cursor riêng (commit độc lập với transaction hiện tại)
+        để lần gửi sau dùng lại thay vì tạo giao dịch mới, dù lỗi sau đó làm
+        rollback toàn bộ transaction hay chỉ 1 savepoint.
+
+        Args:
+            sent (list[tuple]): [(signer, vals)] của người ký đã tạo giao dịch
+        """
+        if not sent:
+            return
+        data = [(signer.id, vals) for signer, vals in sent]
+        try:
+            with self.env.registry.cursor() as cr:
+                # Không chờ lâu nếu transaction hiện tại đang giữ khóa người ký
+                cr.execute("SET LOCAL lock_timeout = '5s'")
+                Signer = api.Environment(cr, SUPERUSER_ID, {})["trasas.signature.signer"]
+                for signer_id, vals in data:
+                    Signer.browse(signer_id).exists().write(vals)
+        except Exception:
+            _logger.exception("Failed to keep %s SmartCA transactions", len(data))
+        # Giá trị mới nằm ngoài snapshot của transaction hiện tại: bỏ cache
+        self.env["trasas.signature.signer"].browse(
+            [signer_id for signer_id, _v in data]
+        ).invalidate_recordset()
+
     def _vnpt_smartca_get_status(self, request):
         """Poll status per signer using tran_code."""
         self.ensure_one()
-        res = {"request_status": "pending", "signers": []}
-        all_signed = True
-        any_refused = False
+        result = self._vnpt_smartca_get_status_batch(request)[request.id]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _vnpt_smartca_status_targets(self, request):
+        """Người ký cần hỏi trạng thái: [(signer, tran_candidates, payload)].
 
+        Người ký đã ký/từ chối không hỏi lại (trạng thái không thể đổi nữa).
+        """
+        targets = []
         for signer in request.signer_ids:
+            if signer.state in ("signed", "refused"):
+                targets.append((signer, [], None))
+                continue
             tran_candidates = []
             for candidate in (
                 signer.vnpt_tran_code,
@@ -730,41 +1171,128 @@ class TrasasSignatureProvider(models.Model):
                 candidate = (candidate or "").strip()
                 if candidate and candidate not in tran_candidates:
                     tran_candidates.append(candidate)
-            if not tran_candidates:
-                all_signed = False
+            payload = {
+                "sp_id": self._vnpt_smartca_payload_sp_id(),
+                "sp_password": self.api_secret,
+                "user_id": signer.id_number or "",
+            }
+            targets.append((signer, tran_candidates, payload))
+        return targets
+
+    def _vnpt_smartca_get_status_batch(self, sig_requests, deadline=None):
+        """Hỏi trạng thái nhiều yêu cầu ký: call HTTP chạy song song (giới hạn
+        tốc độ theo nhà cung cấp), log API ghi 1 lần, rồi cập nhật người ký.
+
+        Returns:
+            dict: {request_id: dict trạng thái | Exception}; yêu cầu chưa kịp
+            hỏi trước ``deadline`` không có trong kết quả
+        """
+        self.ensure_one()
+        base_url = self._vnpt_smartca_base_url()
+        headers = self._vnpt_smartca_headers()
+        http = self._get_http_options(idempotent=True)
+        limiter = self._get_rate_limiter()
+
+        targets = {request.id: self._vnpt_smartca_status_targets(request) for request in sig_requests}
+        jobs = [
+            (request_id, signer, (http, base_url, headers, candidates, payload, limiter, deadline))
+            for request_id, request_targets in targets.items()
+            for signer, candidates, payload in request_targets
+            if candidates
+        ]
+        if len(jobs) > 1:
+            workers = min(len(jobs), max(self.http_pool_size or 10, 1))
+            with ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="smartca"
+            ) as executor:
+                futures = [executor.submit(_smartca_status_job, *args) for _r, _s, args in jobs]
+                outputs = [future.result() for future in futures]
+        else:
+            outputs = [_smartca_status_job(*args) for _r, _s, args in jobs]
+        polled = {signer.id: output for (_r, signer, _a), output in zip(jobs, outputs)}
+
+        self._vnpt_smartca_log_api(
+            [
+                self._vnpt_smartca_log_vals(
+                    request=signer.request_id,
+                    signer=signer,
+                    operation=operation,
+                    endpoint=endpoint,
+                    payload=payload,
+                    outcome=outcome,
+                )
+                for (_r, signer, _a), (calls, _state) in zip(jobs, outputs)
+                for endpoint, operation, payload, outcome in calls
+            ]
+        )
+
+        results = {}
+        for request in sig_requests:
+            request_targets = targets[request.id]
+            # Hết thời gian trước khi hỏi xong: để lần chạy sau
+            if any(
+                polled.get(signer.id, ((), ""))[1] == "timeout"
+                for signer, _c, _p in request_targets
+            ):
                 continue
-            data = None
-            last_error = None
-            for tran in tran_candidates:
-                try:
-                    data = self._vnpt_smartca_post(
-                        f"/v1/signatures/sign/{tran}/status",
-                        {
-                            "sp_id": self._vnpt_smartca_payload_sp_id(),
-                            "sp_password": self.api_secret,
-                            "user_id": signer.id_number or "",
-                        },
-                        request=request,
-                        signer=signer,
-                        operation="status",
-                    )
-                    break
-                except UserError as e:
-                    last_error = str(e)
-                    if "sig_tran_not_exist" in last_error:
-                        _logger.warning(
-                            "SmartCA status not found for %s (%s).",
-                            signer.signer_name or signer.id,
-                            tran,
-                        )
-                        continue
-                    raise
-            if data is None:
-                signer.write(
+            try:
+                results[request.id] = self._vnpt_smartca_apply_status(
+                    request, request_targets, polled
+                )
+            except Exception as e:
+                results[request.id] = e
+        return results
+
+    def _vnpt_smartca_apply_status(self, request, targets, polled):
+        """Dựng kết quả trạng thái của 1 yêu cầu từ các call đã thực hiện.
+
+        Người ký chỉ được cập nhật khi dấu vân tay trạng thái (các giá trị đã
+        trích từ phản hồi) khác lần trước; ``unchanged`` = True khi không người
+        ký nào thay đổi.
+        """
+        res = {"request_status": "pending", "signers": []}
+        all_signed = True
+        any_refused = False
+        changed = False
+
+        for signer, candidates, payload in targets:
+            if signer.state in ("signed", "refused"):
+                mapped = signer.state
+                if mapped != "signed":
+                    all_signed = False
+                    any_refused = True
+                res["signers"].append(
                     {
-                        "vnpt_last_status": "sig_tran_not_exist",
+                        "provider_signer_ref": signer.provider_signer_ref,
+                        "status": mapped,
+                        "signed_date": signer.signed_date,
                     }
                 )
+                continue
+            if not candidates:
+                all_signed = False
+                continue
+
+            calls, state = polled[signer.id]
+            for _endpoint, _operation, _payload, outcome in calls:
+                if outcome["error"] and _smartca_tran_not_exist(outcome):
+                    _logger.warning(
+                        "SmartCA status not found for %s (%s).",
+                        signer.signer_name or signer.id,
+                        outcome["url"],
+                    )
+            if state == "error":
+                self._vnpt_smartca_check_outcome(calls[-1][3], payload)
+            if state != "done":
+                fingerprint = _status_fingerprint("sig_tran_not_exist")
+                if fingerprint != signer.vnpt_status_fingerprint:
+                    changed = True
+                    signer.write(
+                        {
+                            "vnpt_last_status": "sig_tran_not_exist",
+                            "vnpt_status_fingerprint": fingerprint,
+                        }
+                    )
                 all_signed = False
                 res["signers"].append(
                     {
@@ -775,6 +1303,7 @@ class TrasasSignatureProvider(models.Model):
                 )
                 continue
 
+            data = calls[-1][3]["data"]
             payload_data = data.get("data") if isinstance(data, dict) else {}
             status_code = data.get("status_code") if isinstance(data, dict) else None
             status_value = None
@@ -828,16 +1357,22 @@ class TrasasSignatureProvider(models.Model):
                 mapped = "signed"
                 signed_date = fields.Datetime.now()
 
-            signer.write(
-                {
-                    "vnpt_last_status": str(
-                        status_code or status_value or message or ""
-                    ),
-                    "vnpt_signature_value": sig_val or signer.vnpt_signature_value,
-                    "vnpt_timestamp_signature": ts_sig
-                    or signer.vnpt_timestamp_signature,
-                }
+            fingerprint = _status_fingerprint(
+                status_code, status_value, message, sig_val, ts_sig, mapped
             )
+            if fingerprint != signer.vnpt_status_fingerprint:
+                changed = True
+                signer.write(
+                    {
+                        "vnpt_last_status": str(
+                            status_code or status_value or message or ""
+                        ),
+                        "vnpt_signature_value": sig_val or signer.vnpt_signature_value,
+                        "vnpt_timestamp_signature": ts_sig
+                        or signer.vnpt_timestamp_signature,
+                        "vnpt_status_fingerprint": fingerprint,
+                    }
+                )
 
             if mapped != "signed":
                 all_signed = False
@@ -856,12 +1391,17 @@ class TrasasSignatureProvider(models.Model):
             res["request_status"] = "cancelled"
         elif all_signed and request.signer_ids:
             res["request_status"] = "completed"
+        res["unchanged"] = not changed
         return res
 
     def _vnpt_smartca_download_signed(self, request):
-        """Return ZIP package (pdf + signatures.json) for hash signing."""
+        """Write ZIP package (pdf + signatures.json) for hash signing.
+
+        PDF được đọc thẳng từ filestore vào ZIP, gói ZIP được ghi vào
+        attachment của trường signed_document (không qua base64).
+        """
         self.ensure_one()
-        pdf_bytes = base64.b64decode(request.document_file or b"")
+        source = request._get_binary_attachment("document_file")
         audit = {
             "provider": "VNPT SmartCA",
             "provider_type": "vnpt_smartca",
@@ -892,19 +1432,35 @@ class TrasasSignatureProvider(models.Model):
                 }
             )
 
+        pdf_name = request.document_filename or "document.pdf"
         buf = io.BytesIO()
         with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as z:
-            z.writestr(request.document_filename or "document.pdf", pdf_bytes)
+            if source.store_fname:
+                z.write(source._full_path(source.store_fname), arcname=pdf_name)
+            else:
+                z.writestr(pdf_name, source.raw or b"")
             z.writestr(
                 "signatures.json",
                 json.dumps(audit, ensure_ascii=False, indent=2),
             )
 
-        package_b64 = base64.b64encode(buf.getvalue())
         request.sudo().write(
             {"signed_package_info": json.dumps(audit, ensure_ascii=False)}
         )
-        return package_b64
+        request._get_binary_attachment("signed_document").unlink()
+        attachment = self.env["ir.attachment"].sudo().create(
+            {
+                "name": "signed_document",
+                "res_model": request._name,
+                "res_field": "signed_document",
+                "res_id": request.id,
+                "type": "binary",
+                "mimetype": "application/zip",
+                "raw": buf.getvalue(),
+            }
+        )
+        request.invalidate_recordset(["signed_document"])
+        return attachment
 
     def _vnpt_smartca_cancel(self, request):
         """SmartCA does not have a cancel API - just return True."""
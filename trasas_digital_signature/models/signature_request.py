@@ -1,14 +1,23 @@
 # -*- coding: utf-8 -*-
+import hmac
 import logging
+import re
+import time
 import uuid
-import base64
 import hashlib
+from datetime import timedelta
 
-from odoo import _, api, fields, models
+from odoo import _, api, fields, models, tools
 from odoo.exceptions import UserError
+from odoo.tools import split_every
+
+from .signature_signer import _create_unique_index
 
 _logger = logging.getLogger(__name__)
 
+# Token callback: uuid4().hex
+_CALLBACK_TOKEN_RE = re.compile(r"[0-9a-f]{32}")
+
 
 class TrasasSignatureRequest(models.Model):
     """Yêu cầu ký số - liên kết với hợp đồng"""
@@ -18,6 +27,16 @@ class TrasasSignatureRequest(models.Model):
     _inherit = ["mail.thread", "mail.activity.mixin"]
     _order = "create_date desc, id desc"
 
+    # Cron kiểm tra trạng thái: chu kỳ hỏi lại (phút) tăng gấp đôi sau mỗi lần
+    # không có thay đổi, trở về mức nhỏ nhất khi có thay đổi. Mức trần (mặc
+    # định 2 giờ) cấu hình qua trasas_digital_signature.status_poll_max_interval
+    _STATUS_POLL_MIN_INTERVAL = 30
+    _STATUS_POLL_MAX_INTERVAL = 2 * 60
+    _STATUS_POLL_BATCH_SIZE = 50
+
+    # Kích thước mỗi lần đọc file khi tính hash
+    _HASH_CHUNK_SIZE = 1024 * 1024
+
     # ------------------------------------------------------------------
     # Fields
     # ------------------------------------------------------------------
@@ -117,8 +136,20 @@ class TrasasSignatureRequest(models.Model):
         string="Token callback",
         readonly=True,
         copy=False,
+    )
+
+    # Status polling
+    next_status_check = fields.Datetime(
+        string="Kiểm tra trạng thái tiếp theo",
+        readonly=True,
+        copy=False,
         index=True,
     )
+    status_check_interval = fields.Integer(
+        string="Chu kỳ kiểm tra (phút)",
+        readonly=True,
+        copy=False,
+    )
 
     # Signed document
     signed_document = fields.Binary(
@@ -171,6 +202,27 @@ class TrasasSignatureRequest(models.Model):
                 signers.filtered(lambda s: s.state == "signed")
             )
 
+    def init(self):
+        # Thay index thường cũ (index=True) bằng unique index
+        self.env.cr.execute(
+            "DROP INDEX IF EXISTS trasas_signature_request__callback_token_index"
+        )
+        _create_unique_index(self.env.cr, self._table, "callback_token")
+
+    @api.model
+    def _get_by_callback_token(self, token):
+        """Tra yêu cầu ký theo token callback (unique index), so sánh token
+        bằng hmac.compare_digest để không lộ thông tin qua thời gian phản hồi."""
+        token = token or ""
+        if not _CALLBACK_TOKEN_RE.fullmatch(token):
+            return self.browse()
+        sig_request = self.search([("callback_token", "=", token)], limit=1)
+        if not sig_request or not hmac.compare_digest(
+            sig_request.callback_token.encode(), token.encode()
+        ):
+            return self.browse()
+        return sig_request
+
     # ------------------------------------------------------------------
     # CRUD
     # ------------------------------------------------------------------
@@ -189,20 +241,84 @@ class TrasasSignatureRequest(models.Model):
                 vals["callback_token"] = uuid.uuid4().hex
         return super().create(vals_list)
 
+    def write(self, vals):
+        res = super().write(vals)
+        if "document_file" in vals:
+            # Giao dịch SmartCA giữ lại từ lần gửi lỗi trước ký trên hash của
+            # file cũ: bỏ để lần gửi sau tạo giao dịch mới
+            self.filtered(lambda r: r.state == "draft").signer_ids.filtered(
+                "vnpt_tran_code"
+            ).write(
+                {
+                    "vnpt_tran_code": False,
+                    "vnpt_transaction_id": False,
+                    "vnpt_tran_date": False,
+                    "provider_signer_ref": False,
+                }
+            )
+        return res
+
     def _prepare_hash_for_signing(self):
-        """Compute hash (hex) for the current document_file."""
+        """Compute hash (hex) for the current document_file.
+
+        Đọc file trong filestore theo từng khối (không giải mã base64 cả file),
+        kết quả được cache theo checksum của attachment.
+        """
         self.ensure_one()
-        if not self.document_file:
+        attachment = self._get_binary_attachment("document_file")
+        if not attachment:
             return
-        raw = base64.b64decode(self.document_file)
         algo = (self.hash_algo or "sha256").lower()
-        if algo == "sha1":
-            h = hashlib.sha1(raw).hexdigest()
-        else:
-            h = hashlib.sha256(raw).hexdigest()
+        if algo not in ("sha1", "sha256"):
+            algo = "sha256"
+        h = self._hash_for_checksum(attachment.checksum, algo, attachment.id)
         self.hash_hex = h
         return h
 
+    def _get_binary_attachment(self, field_name):
+        """ir.attachment lưu trường Binary (attachment=True) của yêu cầu"""
+        self.ensure_one()
+        return self.env["ir.attachment"].sudo().search(
+            [
+                ("res_model", "=", self._name),
+                ("res_field", "=", field_name),
+                ("res_id", "=", self.id),
+            ],
+            limit=1,
+        )
+
+    @api.model
+    def _hash_for_checksum(self, checksum, algo, attachment_id):
+        """Hash nội dung attachment - cache theo checksum (cùng nội dung, cùng hash).
+
+        Attachment không có checksum không được cache (khóa cache sẽ trùng).
+        """
+        if not checksum:
+            return self._hash_attachment(attachment_id, algo)
+        # checksum của ir.attachment chính là SHA-1 của nội dung
+        if algo == "sha1":
+            return checksum
+        return self._hash_for_checksum_cached(checksum, algo, attachment_id)
+
+    @api.model
+    @tools.ormcache("checksum", "algo")
+    def _hash_for_checksum_cached(self, checksum, algo, attachment_id):
+        return self._hash_attachment(attachment_id, algo)
+
+    @api.model
+    def _hash_attachment(self, attachment_id, algo):
+        """Hash nội dung attachment, đọc file trong filestore theo từng khối"""
+        attachment = self.env["ir.attachment"].sudo().browse(attachment_id)
+        digest = hashlib.new(algo)
+        if attachment.store_fname:
+            path = attachment._full_path(attachment.store_fname)
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(self._HASH_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+        else:
+            digest.update(attachment.raw or b"")
+        return digest.hexdigest()
+
     # ------------------------------------------------------------------
     # Actions
     # ------------------------------------------------------------------
@@ -309,6 +425,11 @@ class TrasasSignatureRequest(models.Model):
         if self.state not in ("sent", "partially_signed"):
             return
         result = self.provider_id._provider_get_status(self)
+        self._apply_status_result(result)
+
+    def _apply_status_result(self, result):
+        """Áp dụng kết quả kiểm tra trạng thái từ nhà cung cấp"""
+        self.ensure_one()
         if not isinstance(result, dict):
             _logger.warning(
                 "Provider %s returned invalid status payload for %s: %r",
@@ -317,6 +438,17 @@ class TrasasSignatureRequest(models.Model):
                 result,
             )
             return
+        if result.get("unchanged"):
+            # NCC không có gì mới: chỉ xử lý tiếp nếu lần trước chưa áp dụng
+            # xong (VD: lỗi giữa chừng, hoặc đã ký đủ nhưng chưa tải được file)
+            local_states = {s.provider_signer_ref: s.state for s in self.signer_ids}
+            not_applied = any(
+                data.get("status") in ("signed", "refused")
+                and local_states.get(data.get("provider_signer_ref")) != data.get("status")
+                for data in result.get("signers", [])
+            )
+            if not not_applied and set(local_states.values()) != {"signed"}:
+                return
         self._process_status_update(result)
 
     # ------------------------------------------------------------------
@@ -327,13 +459,18 @@ class TrasasSignatureRequest(models.Model):
         """Process status update from provider (callback or polling)."""
         self.ensure_one()
 
+        signer_by_ref = {}
+        Signer = self.env["trasas.signature.signer"]
+        for signer in self.signer_ids:
+            for field_name in Signer._PROVIDER_REF_FIELDS:
+                if signer[field_name]:
+                    signer_by_ref.setdefault(signer[field_name], signer)
+
         for signer_data in status_data.get("signers", []):
             provider_signer_ref = signer_data.get("provider_signer_ref")
             if not provider_signer_ref:
                 continue
-            signer = self.signer_ids.filtered(
-                lambda s, ref=provider_signer_ref: s.provider_signer_ref == ref
-            )
+            signer = signer_by_ref.get(provider_signer_ref)
             if not signer:
                 continue
 
@@ -393,6 +530,22 @@ class TrasasSignatureRequest(models.Model):
                     self._send_to_next_signer()
                     self._check_completion()
         else:
+            # Callback có mã giao dịch phải thuộc đúng yêu cầu của token
+            ref = isinstance(payload, dict) and (
+                payload.get("tran_code") or payload.get("transaction_id")
+            )
+            if ref:
+                ref_request, _signer = self.env[
+                    "trasas.signature.signer"
+                ]._resolve_provider_ref(str(ref))
+                if ref_request and ref_request != self:
+                    _logger.warning(
+                        "Callback for %s references transaction %s of %s. Ignored.",
+                        self.name,
+                        ref,
+                        ref_request.name,
+                    )
+                    return
             self.action_check_status()
 
     # ------------------------------------------------------------------
@@ -619,14 +772,15 @@ class TrasasSignatureRequest(models.Model):
             else:
                 signed_fname = f"signed_{fname}"
 
-            self.write(
-                {
-                    "state": "completed",
-                    "completed_date": fields.Datetime.now(),
-                    "signed_document": signed_doc,
-                    "signed_document_filename": signed_fname,
-                }
-            )
+            vals = {
+                "state": "completed",
+                "completed_date": fields.Datetime.now(),
+                "signed_document_filename": signed_fname,
+            }
+            # Provider có thể đã ghi thẳng file đã ký vào attachment (không qua base64)
+            if not isinstance(signed_doc, models.BaseModel):
+                vals["signed_document"] = signed_doc
+            self.write(vals)
 
             self.message_post(
                 body=_(
@@ -656,21 +810,124 @@ class TrasasSignatureRequest(models.Model):
 
     @api.model
     def _cron_check_signature_status(self):
-        """Cron: kiểm tra trạng thái ký định kỳ (fallback cho webhook)."""
-        requests = self.search(
-            [("state", "in", ("sent", "partially_signed"))]
+        """Cron: kiểm tra trạng thái ký định kỳ (fallback cho webhook).
+
+        - Chỉ lấy yêu cầu đến hạn kiểm tra (``next_status_check``), chu kỳ
+          tăng dần khi trạng thái không đổi
+        - Mỗi lô gọi nhà cung cấp 1 lần (provider tự gọi song song, giới hạn
+          tốc độ), ghi chu kỳ kiểm tra mới theo nhóm và commit sau mỗi lô
+        - Dừng khi hết thời gian cho phép; yêu cầu chưa kiểm tra được giữ
+          nguyên hạn cũ nên được ưu tiên ở lần chạy sau
+        """
+        budget = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("trasas_digital_signature.status_poll_time_budget", 300)
+        )
+        deadline = time.monotonic() + budget
+        now = fields.Datetime.now()
+        todo = self.search(
+            [
+                ("state", "in", ("sent", "partially_signed")),
+                "|",
+                ("next_status_check", "=", False),
+                ("next_status_check", "<=", now),
+            ],
+            order="next_status_check asc nulls first, id",
+        )
+
+        checked = 0
+        for batch_ids in split_every(self._STATUS_POLL_BATCH_SIZE, todo.ids):
+            if time.monotonic() >= deadline:
+                break
+            batch = self.browse(batch_ids).with_context(
+                skip_download_error_message=True
+            )
+            checked += batch._poll_status_batch(deadline)
+            if not self.env.registry.in_test_mode():
+                self.env.cr.commit()
+
+        remaining = len(todo) - checked
+        _logger.info(
+            "Signature status cron: %s checked, %s carried over", checked, remaining
+        )
+        if remaining:
+            cron = self.env.ref(
+                "trasas_digital_signature.ir_cron_check_signature_status",
+                raise_if_not_found=False,
+            )
+            if cron:
+                cron._trigger(now + timedelta(minutes=5))
+
+    def _poll_status_batch(self, deadline=None):
+        """Kiểm tra trạng thái một lô yêu cầu và lên lịch lần kiểm tra sau.
+
+        Returns:
+            int: Số yêu cầu đã kiểm tra (không tính yêu cầu bị hoãn do hết giờ)
+        """
+        results = {}
+        for provider in self.provider_id:
+            provider_requests = self.filtered(lambda r, p=provider: r.provider_id == p)
+            results.update(
+                provider._provider_get_status_batch(provider_requests, deadline=deadline)
+            )
+
+        max_interval = max(
+            int(
+                self.env["ir.config_parameter"]
+                .sudo()
+                .get_param(
+                    "trasas_digital_signature.status_poll_max_interval",
+                    self._STATUS_POLL_MAX_INTERVAL,
+                )
+            ),
+            self._STATUS_POLL_MIN_INTERVAL,
         )
-        for req in requests:
+        by_interval = {}
+        for req in self:
+            if req.id not in results:
+                continue
+            result = results[req.id]
+            before = req._status_snapshot()
             try:
-                req.with_context(
-                    skip_download_error_message=True
-                ).action_check_status()
+                if isinstance(result, Exception):
+                    raise result
+                with self.env.cr.savepoint():
+                    req._apply_status_result(result)
             except Exception as e:
                 _logger.error(
                     "Error checking signature status for %s: %s",
                     req.name,
                     e,
                 )
+            if req._status_snapshot() != before:
+                interval = self._STATUS_POLL_MIN_INTERVAL
+            else:
+                interval = min(
+                    max(req.status_check_interval * 2, self._STATUS_POLL_MIN_INTERVAL),
+                    max_interval,
+                )
+            by_interval.setdefault(interval, []).append(req.id)
+
+        now = fields.Datetime.now()
+        for interval, ids in by_interval.items():
+            self.browse(ids).write(
+                {
+                    "status_check_interval": interval,
+                    "next_status_check": now + timedelta(minutes=interval),
+                }
+            )
+        return sum(len(ids) for ids in by_interval.values())
+
+    def _status_snapshot(self):
+        self.ensure_one()
+        return (
+            self.state,
+            tuple(
+                (s.id, s.state, s.vnpt_last_status, bool(s.vnpt_signature_value))
+                for s in self.signer_ids
+            ),
+        )
 
     @api.model
     def _cron_check_signature_expiry(self):
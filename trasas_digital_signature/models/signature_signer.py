@@ -1,6 +1,12 @@
 # -*- coding: utf-8 -*-
+import logging
+
+from psycopg2 import Error as PsycopgError
+
 from odoo import api, fields, models
 
+_logger = logging.getLogger(__name__)
+
 
 class TrasasSignatureSigner(models.Model):
     """Người ký trong yêu cầu ký số"""
@@ -56,9 +62,16 @@ class TrasasSignatureSigner(models.Model):
     vnpt_serial_number = fields.Char(string="Serial chứng thư", readonly=True, copy=False)
     vnpt_tran_code = fields.Char(string="Mã giao dịch (tran_code)", readonly=True, copy=False)
     vnpt_transaction_id = fields.Char(string="Transaction ID", readonly=True, copy=False)
+    vnpt_tran_date = fields.Datetime(string="Thời điểm tạo giao dịch", readonly=True, copy=False)
     vnpt_signature_value = fields.Text(string="Giá trị chữ ký (signature_value)", readonly=True, copy=False)
     vnpt_timestamp_signature = fields.Char(string="Timestamp chữ ký", readonly=True, copy=False)
     vnpt_last_status = fields.Char(string="Trạng thái SmartCA", readonly=True, copy=False)
+    vnpt_status_fingerprint = fields.Char(
+        string="Dấu vân tay trạng thái",
+        readonly=True,
+        copy=False,
+        help="Hash phản hồi trạng thái gần nhất từ SmartCA, dùng để bỏ qua cập nhật khi không đổi",
+    )
 
     provider_signer_ref = fields.Char(
         string="Mã NCC",
@@ -67,8 +80,60 @@ class TrasasSignatureSigner(models.Model):
         help="Mã tham chiếu người ký tại nhà cung cấp",
     )
 
+    # Mã tham chiếu tại nhà cung cấp - duy nhất, dùng để tra người ký từ callback
+    _PROVIDER_REF_FIELDS = ("provider_signer_ref", "vnpt_tran_code", "vnpt_transaction_id")
+
+    def init(self):
+        for field_name in self._PROVIDER_REF_FIELDS:
+            _create_unique_index(self.env.cr, self._table, field_name)
+
+    @api.model
+    def _resolve_provider_ref(self, ref):
+        """Tra (yêu cầu ký, người ký) từ mã tham chiếu của nhà cung cấp
+        (provider_signer_ref, tran_code hoặc transaction_id) bằng 1 truy vấn
+        trên các cột có index.
+
+        Returns:
+            tuple: (trasas.signature.request, trasas.signature.signer) - rỗng nếu không thấy
+        """
+        ref = (ref or "").strip()
+        if not ref:
+            return self.env["trasas.signature.request"], self.browse()
+        domain = ["|", "|"] + [(f, "=", ref) for f in self._PROVIDER_REF_FIELDS]
+        signer = self.search(domain, limit=1)
+        return signer.request_id, signer
+
     @api.onchange("partner_id")
     def _onchange_partner_id(self):
         if self.partner_id:
             self.signer_name = self.partner_id.name
             self.signer_email = self.partner_id.email
+
+
+def _create_unique_index(cr, table, column):
+    """Unique index (bỏ qua giá trị rỗng) cho cột mã tham chiếu.
+
+    Nếu dữ liệu cũ đang trùng thì tạo index thường để không chặn cập nhật
+    module; cần làm sạch dữ liệu rồi cập nhật lại để có ràng buộc duy nhất.
+    """
+    name = f"{table}_{column}_uniq"
+    try:
+        with cr.savepoint(flush=False):
+            cr.execute(
+                f"""
+                CREATE UNIQUE INDEX IF NOT EXISTS {name}
+                ON {table} ({column})
+                WHERE {column} IS NOT NULL AND {column} != ''
+                """
+            )
+    except PsycopgError:
+        _logger.warning(
+            "Duplicate values in %s.%s: creating a non-unique index instead", table, column
+        )
+        cr.execute(
+            f"""
+            CREATE INDEX IF NOT EXISTS {table}_{column}_idx
+            ON {table} ({column})
+            WHERE {column} IS NOT NULL AND {column} != ''
+            """
+        )
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from psycopg2 import IntegrityError
+
+from odoo import _, api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+
+class TrasasSignatureWebhookEvent(models.Model):
+    """Hàng đợi callback từ nhà cung cấp chữ ký số.
+
+    Webhook chỉ lưu callback vào hàng đợi rồi trả lời ngay; cron xử lý
+    (tải tài liệu đã ký, hoàn tất hợp đồng, gửi email...) sau đó, có thử lại
+    khi lỗi. Callback trùng (nhà cung cấp gửi lại) bị bỏ qua nhờ dedup_key:
+    theo mã sự kiện của NCC nếu có, ngược lại chỉ so với callback cùng nội
+    dung đang chờ hoặc vừa nhận trong ``_DEDUP_WINDOW`` phút. Callback đã xử
+    lý được xóa sau ``webhook_retention_days`` ngày.
+    """
+
+    _name = "trasas.signature.webhook.event"
+    _description = "Callback chữ ký số"
+    _order = "id desc"
+
+    _BATCH_SIZE = 20
+    _MAX_ATTEMPTS = 5
+    # Thời gian chờ thử lại lần thứ n = _RETRY_DELAY * 2^(n-1) (phút)
+    _RETRY_DELAY = 5
+    # Callback không có mã sự kiện: cùng nội dung trong khoảng này (phút) là trùng
+    _DEDUP_WINDOW = 10
+    _DEFAULT_RETENTION_DAYS = 30
+
+    request_id = fields.Many2one(
+        "trasas.signature.request",
+        string="Yêu cầu ký",
+        required=True,
+        ondelete="cascade",
+        readonly=True,
+    )
+    dedup_key = fields.Char(string="Khóa chống trùng", required=True, readonly=True)
+    payload = fields.Text(string="Payload", readonly=True)
+    state = fields.Selection(
+        [
+            ("pending", "Chờ xử lý"),
+            ("done", "Đã xử lý"),
+            ("failed", "Lỗi"),
+        ],
+        string="Trạng thái",
+        default="pending",
+        required=True,
+        readonly=True,
+        index=True,
+    )
+    attempt_count = fields.Integer(string="Số lần xử lý", readonly=True)
+    next_attempt = fields.Datetime(
+        string="Xử lý lúc",
+        default=fields.Datetime.now,
+        readonly=True,
+    )
+    processed_date = fields.Datetime(string="Ngày xử lý", readonly=True)
+    error_message = fields.Text(string="Lỗi", readonly=True)
+
+    def init(self):
+        # Chỉ chặn trùng tuyệt đối giữa các callback đang chờ; trùng với lịch
+        # sử được kiểm tra trong _enqueue
+        self.env.cr.execute(
+            """
+            DROP INDEX IF EXISTS trasas_signature_webhook_event_dedup_uniq;
+            CREATE UNIQUE INDEX IF NOT EXISTS trasas_signature_webhook_event_dedup_pending_uniq
+            ON trasas_signature_webhook_event (dedup_key)
+            WHERE state = 'pending';
+            CREATE INDEX IF NOT EXISTS trasas_signature_webhook_event_dedup_idx
+            ON trasas_signature_webhook_event (dedup_key, create_date);
+            CREATE INDEX IF NOT EXISTS trasas_signature_webhook_event_done_idx
+            ON trasas_signature_webhook_event (processed_date)
+            WHERE state = 'done'
+            """
+        )
+        self.env.cr.execute(
+            """
+            CREATE INDEX IF NOT EXISTS trasas_signature_webhook_event_pending_idx
+            ON trasas_signature_webhook_event (next_attempt)
+            WHERE state = 'pending'
+            """
+        )
+
+    @api.model
+    def _get_event_id(self, payload):
+        if isinstance(payload, dict):
+            return payload.get("event_id") or payload.get("eventId")
+        return None
+
+    @api.model
+    def _make_dedup_key(self, token, payload):
+        """Khóa chống trùng: mã sự kiện của NCC nếu có, ngược lại hash payload"""
+        event_id = self._get_event_id(payload)
+        if event_id:
+            return f"{token}:{event_id}"
+        raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return f"{token}:{hashlib.sha256(raw.encode()).hexdigest()}"
+
+    @api.model
+    def _enqueue(self, sig_request, token, payload):
+        """Lưu callback vào hàng đợi.
+
+        Returns:
+            bool: False nếu callback đã nhận trước đó (trùng)
+        """
+        dedup_key = self._make_dedup_key(token, payload)
+        domain = [("dedup_key", "=", dedup_key)]
+        if not self._get_event_id(payload):
+            # Không có mã sự kiện: callback cùng nội dung về sau (VD "signed"
+            # sau khi gửi lại) là callback mới, chỉ bỏ qua bản gửi lại gần đây
+            domain += [
+                "|",
+                ("state", "=", "pending"),
+                (
+                    "create_date",
+                    ">=",
+                    fields.Datetime.now() - timedelta(minutes=self._DEDUP_WINDOW),
+                ),
+            ]
+        if self.search_count(domain, limit=1):
+            return False
+        try:
+            with self.env.cr.savepoint():
+                self.create(
+                    {
+                        "request_id": sig_request.id,
+                        "dedup_key": dedup_key,
+                        "payload": json.dumps(payload, ensure_ascii=False, default=str),
+                    }
+                )
+        except IntegrityError:
+            # Callback trùng đến cùng lúc
+            return False
+        cron = self.env.ref(
+            "trasas_digital_signature.ir_cron_process_signature_webhooks",
+            raise_if_not_found=False,
+        )
+        if cron:
+            cron._trigger()
+        return True
+
+    @api.model
+    def _cron_process_events(self):
+        """Cron: xử lý callback đang chờ, mỗi lần tối đa _BATCH_SIZE callback.
+
+        Callback được khóa bằng FOR UPDATE SKIP LOCKED nên nhiều worker có thể
+        chạy song song mà không xử lý trùng.
+        """
+        commit = not self.env.registry.in_test_mode()
+        processed = 0
+        while processed < self._BATCH_SIZE:
+            self.flush_model()
+            self.env.cr.execute(
+                """
+                SELECT id FROM trasas_signature_webhook_event
+                 WHERE state = 'pending' AND next_attempt <= (now() at time zone 'UTC')
+              ORDER BY next_attempt, id
+                 LIMIT 1
+                   FOR UPDATE SKIP LOCKED
+                """
+            )
+            row = self.env.cr.fetchone()
+            if not row:
+                break
+            self.browse(row[0])._process()
+            processed += 1
+            if commit:
+                self.env.cr.commit()
+
+        remaining = self.search_count(
+            [("state", "=", "pending"), ("next_attempt", "<=", fields.Datetime.now())],
+            limit=1,
+        )
+        if remaining:
+            self.env.ref(
+                "trasas_digital_signature.ir_cron_process_signature_webhooks"
+            )._trigger()
+
+    def _process(self):
+        self.ensure_one()
+        sig_request = self.request_id
+        attempt = self.attempt_count + 1
+        try:
+            with self.env.cr.savepoint():
+                if sig_request.state not in ("completed", "cancelled", "expired"):
+                    sig_request._process_callback(json.loads(self.payload or "{}"))
+        except Exception as e:
+            _logger.exception(
+                "Error processing signature callback for %s (attempt %s)",
+                sig_request.name,
+                attempt,
+            )
+            failed = attempt >= self._MAX_ATTEMPTS
+            self.write(
+                {
+                    "attempt_count": attempt,
+                    "state": "failed" if failed else "pending",
+                    "error_message": str(e),
+                    "next_attempt": fields.Datetime.now()
+                    + timedelta(minutes=self._RETRY_DELAY * 2 ** (attempt - 1)),
+                }
+            )
+            if failed:
+                sig_request.message_post(
+                    body=_("Không xử lý được callback từ nhà cung cấp sau %s lần thử: %s")
+                    % (attempt, e)
+                )
+            return
+        self.write(
+            {
+                "attempt_count": attempt,
+                "state": "done",
+                "processed_date": fields.Datetime.now(),
+                "error_message": False,
+            }
+        )
+
+    @api.model
+    def _cron_purge_events(self):
+        """Cron hằng ngày: xóa callback đã xử lý quá thời hạn lưu"""
+        days = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param(
+                "trasas_digital_signature.webhook_retention_days",
+                self._DEFAULT_RETENTION_DAYS,
+            )
+        )
+        if days <= 0:
+            return
+        self.flush_model()
+        self.env.cr.execute(
+            """
+            DELETE FROM trasas_signature_webhook_event
+             WHERE state = 'done' AND processed_date < %s
+            """,
+            (fields.Datetime.now() - timedelta(days=days),),
+        )
+        if self.env.cr.rowcount:
+            _logger.info(
+                "Signature callbacks: %s processed events purged", self.env.cr.rowcount
+            )
+        self.invalidate_model()
+
+    def action_retry(self):
+        # Bỏ qua callback đã có bản trùng đang chờ xử lý
+        pending_keys = set(
+            self.search_fetch(
+                [("dedup_key", "in", self.mapped("dedup_key")), ("state", "=", "pending")],
+                ["dedup_key"],
+            ).mapped("dedup_key")
+        )
+        self.filtered(lambda e: e.dedup_key not in pending_keys).write(
+            {"state": "pending", "next_attempt": fields.Datetime.now()}
+        )
+        self.env.ref(
+            "trasas_digital_signature.ir_cron_process_signature_webhooks"
+        )._trigger()
@@ -18,7 +18,7 @@
     """,
     "author": "LiemPhong",
     "website": "https://www.psmerp.vn",
-    "depends": ["base", "mail", "contacts", "portal", "trasas_portal", "documents"],
+    "depends": ["base", "mail", "contacts", "portal", "trasas_portal", "documents", "trasas_document_management"],
     "data": [
         # Security
         "security/security.xml",
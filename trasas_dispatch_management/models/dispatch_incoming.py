@@ -5,7 +5,7 @@ from odoo.exceptions import ValidationError, UserError
 class TrasasDispatchIncoming(models.Model):
     _name = "trasas.dispatch.incoming"
     _description = "Công văn đến"
-    _inherit = ["mail.thread", "mail.activity.mixin"]
+    _inherit = ["mail.thread", "mail.activity.mixin", "trasas.backfill.mixin"]
     _order = "date_received desc, urgency_id desc"
 
     # --- Default Fields ---
@@ -420,9 +420,12 @@ class TrasasDispatchIncoming(models.Model):
 
     @api.model
     def _create_folders_for_existing(self):
-        records = self.search([("document_folder_id", "=", False)])
-        records._create_document_folder()
-        for rec in self.search([]):
+        """Tạo folder + đồng bộ file cho toàn bộ công văn (qua cron, chạy theo lô, có checkpoint)"""
+        return self._schedule_backfill("trasas_dispatch_management.ir_cron_backfill_dispatch_folders")
+
+    def _backfill_process_batch(self):
+        self.filtered(lambda r: not r.document_folder_id)._create_document_folder()
+        for rec in self:
             if rec.response_file:
                 rec._create_attachment_from_binary(
                     rec.response_file,
@@ -1,5 +1,10 @@
 # -*- coding: utf-8 -*-
+from . import backfill_mixin
+from . import expiry_bucket_mixin
+from . import cache_version
 from . import documents_document
+from . import document_attachment_link
+from . import hr_employee
 from . import doc_access_request
 from . import doc_access_log
 from . import report_wizard
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+
+from odoo import models, api
+
+_logger = logging.getLogger(__name__)
+
+
+class TrasasBackfillMixin(models.AbstractModel):
+    """Chạy backfill (tạo folder, đồng bộ file sang Documents...) theo lô.
+
+    - Mỗi lô ``batch_size`` bản ghi, sắp theo id, commit sau mỗi lô (trừ
+      khi đang cài đặt / nâng cấp module: khi đó toàn bộ nằm trong giao dịch
+      của lần nâng cấp)
+    - Lưu checkpoint (id cuối đã xử lý) trong ``ir.config_parameter``;
+      mỗi lần chạy bắt đầu lại từ đầu, chỉ ``resume=True`` mới tiếp tục
+      từ checkpoint của lần chạy bị ngắt
+    - Ghi log tiến độ (đã xử lý / tổng số) sau mỗi lô
+    - Khi cài đặt / nâng cấp, data file chỉ gọi ``_schedule_backfill``: việc
+      xử lý chạy trong cron (``_cron_run_backfill``), commit theo lô và tiếp
+      tục từ checkpoint nếu lần chạy trước bị ngắt (timeout, restart...)
+
+    Model kế thừa cần override ``_backfill_process_batch`` và có thể
+    override ``_backfill_domain``.
+    """
+
+    _name = "trasas.backfill.mixin"
+    _description = "Backfill theo lô có checkpoint"
+
+    _BACKFILL_DEFAULT_BATCH_SIZE = 200
+
+    @api.model
+    def _backfill_domain(self):
+        """Domain các bản ghi cần backfill"""
+        return []
+
+    def _backfill_process_batch(self):
+        """Xử lý một lô bản ghi (self). Override ở model kế thừa."""
+        raise NotImplementedError()
+
+    @api.model
+    def _backfill_checkpoint_key(self):
+        return "trasas_backfill.%s.last_id" % self._name
+
+    @api.model
+    def _backfill_pending_key(self):
+        return "trasas_backfill.%s.pending" % self._name
+
+    @api.model
+    def _backfill_batch_size(self):
+        return int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param(
+                "trasas_document_management.backfill_batch_size",
+                self._BACKFILL_DEFAULT_BATCH_SIZE,
+            )
+        )
+
+    @api.model
+    def _backfill_can_commit(self):
+        """Không commit khi chạy test, khi cài đặt / nâng cấp module (data file
+        ``<function>``) hoặc khi bị tắt qua context"""
+        return not (
+            self.env.context.get("backfill_no_commit")
+            or self.env.context.get("install_mode")
+            or not self.env.registry.ready
+            or self.env.registry.in_test_mode()
+        )
+
+    @api.model
+    def _backfill_commit(self):
+        """Commit sau mỗi lô (nếu được phép)"""
+        if self._backfill_can_commit():
+            self.env.cr.commit()
+
+    @api.model
+    def _run_backfill(self, batch_size=None, resume=False):
+        """Chạy backfill theo lô.
+
+        Args:
+            batch_size (int): Số bản ghi mỗi lô (mặc định lấy từ cấu hình)
+            resume (bool): Tiếp tục từ checkpoint của lần chạy bị ngắt thay vì
+                chạy lại từ đầu (bản ghi tạo / sửa sau checkpoint sẽ bị bỏ qua)
+
+        Returns:
+            dict: {"processed": số bản ghi đã xử lý, "total": tổng số cần xử lý}
+        """
+        ICP = self.env["ir.config_parameter"].sudo()
+        key = self._backfill_checkpoint_key()
+        batch_size = batch_size or self._backfill_batch_size()
+
+        # Checkpoint chỉ có ý nghĩa khi mỗi lô được commit
+        use_checkpoint = self._backfill_can_commit()
+        last_id = int(ICP.get_param(key, 0) or 0) if resume and use_checkpoint else 0
+        if last_id:
+            _logger.info("Backfill %s: resume from checkpoint id > %s", self._name, last_id)
+
+        domain = self._backfill_domain()
+        total = self.search_count(domain + [("id", ">", last_id)])
+        processed = 0
+        started = time.monotonic()
+
+        while True:
+            batch = self.search(
+                domain + [("id", ">", last_id)], order="id", limit=batch_size
+            )
+            if not batch:
+                break
+
+            batch._backfill_process_batch()
+            last_id = batch[-1].id
+            processed += len(batch)
+            if use_checkpoint:
+                ICP.set_param(key, last_id)
+            self._backfill_commit()
+            # Giải phóng cache của lô vừa xử lý (binary, attachment...)
+            self.env.invalidate_all()
+
+            _logger.info(
+                "Backfill %s: %s/%s records (last id %s, %.1fs)",
+                self._name, processed, total, last_id, time.monotonic() - started,
+            )
+
+        # Hoàn tất: xóa checkpoint để lần re-sync sau chạy lại toàn bộ
+        if use_checkpoint:
+            ICP.set_param(key, False)
+            self._backfill_commit()
+        return {"processed": processed, "total": total}
+
+    @api.model
+    def _schedule_backfill(self, cron_xmlid):
+        """Đánh dấu cần backfill và kích hoạt cron ``cron_xmlid``.
+
+        Gọi từ data file ``<function>`` khi cài đặt / nâng cấp: không xử lý
+        trong giao dịch nâng cấp. Mỗi lần gọi là 1 lần chạy mới (xóa
+        checkpoint của lần chạy trước).
+        """
+        ICP = self.env["ir.config_parameter"].sudo()
+        ICP.set_param(self._backfill_pending_key(), "1")
+        ICP.set_param(self._backfill_checkpoint_key(), False)
+        self.env.ref(cron_xmlid)._trigger()
+
+    @api.model
+    def _cron_run_backfill(self):
+        """Cron: chạy backfill đã được lên lịch, tiếp tục từ checkpoint"""
+        ICP = self.env["ir.config_parameter"].sudo()
+        if not ICP.get_param(self._backfill_pending_key()):
+            return
+        self._run_backfill(resume=True)
+        ICP.set_param(self._backfill_pending_key(), False)
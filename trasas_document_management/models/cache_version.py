@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+
+
+class TrasasCacheVersion(models.Model):
+    """Phiên bản dữ liệu cho các cache ``ormcache`` của TRASAS.
+
+    Cache đưa phiên bản vào khóa (``_get_version``); khi dữ liệu nguồn đổi chỉ
+    cần tăng phiên bản của cache đó (``_bump_version``) thay vì
+    ``registry.clear_cache()`` - vốn xóa toàn bộ cache mặc định (ACL, xmlid...)
+    trên mọi worker.
+
+    Phiên bản lấy từ 1 sequence nên không bao giờ dùng lại: giá trị của giao
+    dịch bị rollback không trùng với giá trị được commit sau đó.
+    """
+
+    _name = "trasas.cache.version"
+    _description = "Phiên bản cache"
+    _log_access = False
+
+    name = fields.Char(string="Cache", required=True, readonly=True)
+    version = fields.Integer(string="Phiên bản", readonly=True)
+
+    def init(self):
+        self.env.cr.execute(
+            """
+            CREATE SEQUENCE IF NOT EXISTS trasas_cache_version_seq;
+            CREATE UNIQUE INDEX IF NOT EXISTS trasas_cache_version_name_uniq
+            ON trasas_cache_version (name)
+            """
+        )
+
+    @api.model
+    def _get_version(self, name):
+        """Phiên bản hiện tại của cache ``name`` (0 nếu chưa từng thay đổi)"""
+        self.env.cr.execute(
+            "SELECT version FROM trasas_cache_version WHERE name = %s", (name,)
+        )
+        row = self.env.cr.fetchone()
+        return row[0] if row else 0
+
+    @api.model
+    def _bump_version(self, name):
+        """Đánh dấu cache ``name`` đã cũ (có hiệu lực với worker khác khi commit)"""
+        self.env.cr.execute(
+            """
+            INSERT INTO trasas_cache_version (name, version)
+            VALUES (%s, nextval('trasas_cache_version_seq'))
+            ON CONFLICT (name) DO UPDATE
+               SET version = nextval('trasas_cache_version_seq')
+            """,
+            (name,),
+        )
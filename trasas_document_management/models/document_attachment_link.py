@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+
+
+class TrasasDocumentAttachmentLink(models.Model):
+    """Liên kết file đính kèm nguồn → documents.document đã đồng bộ.
+
+    Document dùng 1 attachment "phản chiếu" trỏ tới cùng file của attachment
+    nguồn (cùng store_fname / checksum): mỗi nội dung chỉ lưu 1 lần trong
+    filestore và việc đồng bộ không phải đọc / mã hóa lại file.
+    """
+
+    _name = "trasas.document.attachment.link"
+    _description = "Liên kết đồng bộ file → Documents"
+
+    res_model = fields.Char(string="Model nguồn", required=True)
+    res_id = fields.Integer(string="ID nguồn", required=True)
+    source_attachment_id = fields.Many2one(
+        "ir.attachment",
+        string="File nguồn",
+        required=True,
+        ondelete="cascade",
+        index=True,
+    )
+    document_id = fields.Many2one(
+        "documents.document",
+        string="Tài liệu",
+        required=True,
+        ondelete="cascade",
+        index=True,
+    )
+
+    def init(self):
+        self.env.cr.execute(
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS
+                trasas_document_attachment_link_source_uniq
+            ON trasas_document_attachment_link (res_model, res_id, source_attachment_id)
+            """
+        )
+
+    @api.model
+    def _sync_attachments(self, sources):
+        """Đồng bộ file đính kèm của nhiều bản ghi sang Documents (theo lô).
+
+        Args:
+            sources (list[tuple]): [(record, attachments, document_vals)] với
+                document_vals là giá trị cho documents.document mới (folder...)
+
+        Returns:
+            dict: {record.id: documents.document mới tạo}
+        """
+        sources = [src for src in sources if src[0] and src[1]]
+        if not sources:
+            return {}
+        res_model = sources[0][0]._name
+        Document = self.env["documents.document"].sudo()
+
+        # 1 query (index unique): các cặp (bản ghi, file nguồn) đã đồng bộ
+        synced = {
+            (link.res_id, link.source_attachment_id.id)
+            for link in self.sudo().search_fetch(
+                [
+                    ("res_model", "=", res_model),
+                    ("res_id", "in", [record.id for record, _a, _v in sources]),
+                ],
+                ["res_id", "source_attachment_id"],
+            )
+        }
+        pending = [
+            (record, attachment, document_vals)
+            for record, attachments, document_vals in sources
+            for attachment in attachments
+            if (record.id, attachment.id) not in synced
+        ]
+        if not pending:
+            return {}
+
+        mirrors = self._create_mirror_attachments(
+            [(record, attachment) for record, attachment, _v in pending]
+        )
+        documents = Document.create(
+            [
+                dict(
+                    document_vals,
+                    name=record.display_name or attachment.name,
+                    attachment_id=mirror.id,
+                    owner_id=self.env.user.id,
+                )
+                for (record, attachment, document_vals), mirror in zip(pending, mirrors)
+            ]
+        )
+        self.sudo().create(
+            [
+                {
+                    "res_model": res_model,
+                    "res_id": record.id,
+                    "source_attachment_id": attachment.id,
+                    "document_id": document.id,
+                }
+                for (record, attachment, _v), document in zip(pending, documents)
+            ]
+        )
+
+        result = {}
+        for (record, _a, _v), document in zip(pending, documents):
+            result[record.id] = result.get(record.id, Document) | document
+        return result
+
+    @api.model
+    def _create_mirror_attachments(self, pairs):
+        """Tạo attachment trỏ cùng file với attachment nguồn (không sao chép nội dung).
+
+        Args:
+            pairs (list[tuple]): [(record, attachment nguồn)]
+
+        Returns:
+            ir.attachment: các attachment phản chiếu, theo thứ tự của ``pairs``
+        """
+        Attachment = self.env["ir.attachment"].sudo()
+        mirrors = Attachment.create(
+            [
+                {
+                    "name": attachment.name,
+                    "type": "binary",
+                    "res_model": record._name,
+                    "res_id": record.id,
+                }
+                for record, attachment in pairs
+            ]
+        )
+        Attachment.flush_model()
+        # Dùng chung file trong filestore: GC chỉ xóa file khi không còn
+        # attachment nào tham chiếu store_fname
+        self.env.cr.execute(
+            """
+            UPDATE ir_attachment AS mirror
+               SET store_fname = src.store_fname,
+                   db_datas = src.db_datas,
+                   checksum = src.checksum,
+                   file_size = src.file_size,
+                   mimetype = src.mimetype,
+                   index_content = src.index_content
+              FROM unnest(%s::int[], %s::int[]) AS pair(mirror_id, source_id)
+              JOIN ir_attachment AS src ON src.id = pair.source_id
+             WHERE mirror.id = pair.mirror_id
+            """,
+            (mirrors.ids, [attachment.id for _r, attachment in pairs]),
+        )
+        mirrors.invalidate_recordset()
+        return mirrors
+
+    @api.model
+    def _backfill_from_description(self, res_model):
+        """Chuyển dữ liệu đồng bộ cũ (ID file nguồn lưu trong description của
+        attachment bản sao) sang bảng liên kết. Chạy khi upgrade.
+        """
+        self.env.cr.execute(
+            """
+            INSERT INTO trasas_document_attachment_link
+                        (res_model, res_id, source_attachment_id, document_id)
+            SELECT mirror.res_model, mirror.res_id, src.id, doc.id
+              FROM documents_document AS doc
+              JOIN ir_attachment AS mirror ON mirror.id = doc.attachment_id
+              JOIN ir_attachment AS src ON src.id::text = mirror.description
+             WHERE mirror.res_model = %s
+               AND mirror.res_id IS NOT NULL
+               AND mirror.description ~ '^[0-9]+$'
+            ON CONFLICT DO NOTHING
+            """,
+            (res_model,),
+        )
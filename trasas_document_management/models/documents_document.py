@@ -90,7 +90,7 @@ class DocumentsDocumentInherit(models.Model):
     trạng thái hiệu lực, và cảnh báo hết hạn (B5, B12)
     """
 
-    _inherit = "documents.document"
+    _inherit = ["documents.document", "trasas.expiry.bucket.mixin"]
 
     # =====================================================================
     # THÔNG TIN CƠ BẢN BỔ SUNG (B2b)
@@ -127,7 +127,6 @@ class DocumentsDocumentInherit(models.Model):
     days_to_expire = fields.Integer(
         string="Số ngày còn lại",
         compute="_compute_days_to_expire",
-        store=True,
     )
 
     confidential_level = fields.Selection(
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import logging
+from datetime import timedelta
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+
+class TrasasExpiryBucketMixin(models.AbstractModel):
+    """Nhóm thời hạn (đã hết hạn / < 7 ngày / < 30 ngày / còn hạn) được lưu
+    và đánh index, để lọc "sắp hết hạn" bằng SQL thay vì tính trong Python.
+
+    Giá trị phụ thuộc vào ngày hiện tại, nên cron hằng ngày
+    (``_cron_refresh_expiry_buckets``) chỉ tính lại các bản ghi vừa vượt qua
+    mốc của nhóm. Số ngày còn lại thay đổi mỗi ngày nên không lưu, chỉ tính
+    khi đọc.
+
+    Model kế thừa khai báo ``_expiry_date_field`` (trường ngày hết hạn).
+    """
+
+    _name = "trasas.expiry.bucket.mixin"
+    _description = "Nhóm thời hạn hết hiệu lực"
+
+    _expiry_date_field = "validity_date"
+
+    # (nhóm, số ngày còn lại nhỏ hơn) - xét theo thứ tự
+    _EXPIRY_BUCKET_LIMITS = [("expired", 0), ("lt7", 7), ("lt30", 30)]
+
+    expiry_bucket = fields.Selection(
+        [
+            ("expired", "Đã hết hạn"),
+            ("lt7", "Hết hạn trong 7 ngày"),
+            ("lt30", "Hết hạn trong 30 ngày"),
+            ("ok", "Còn hạn"),
+        ],
+        string="Nhóm thời hạn",
+        compute="_compute_expiry_bucket",
+        store=True,
+        index=True,
+        help="Được cập nhật hằng ngày theo ngày hết hạn",
+    )
+
+    @api.depends(lambda self: [self._expiry_date_field])
+    def _compute_expiry_bucket(self):
+        today = fields.Date.context_today(self)
+        for rec in self:
+            rec.expiry_bucket = rec._get_expiry_bucket(rec[rec._expiry_date_field], today)
+
+    @api.model
+    def _get_expiry_bucket(self, expiry_date, today):
+        if not expiry_date:
+            return False
+        days = (expiry_date - today).days
+        for bucket, limit in self._EXPIRY_BUCKET_LIMITS:
+            if days < limit:
+                return bucket
+        return "ok"
+
+    @api.model
+    def _refresh_expiry_buckets(self):
+        """Tính lại nhóm thời hạn cho các bản ghi vừa vượt mốc (1 search mỗi nhóm)"""
+        today = fields.Date.context_today(self)
+        date_field = self._expiry_date_field
+        field = self._fields["expiry_bucket"]
+        Model = self.with_context(active_test=False)
+
+        lower = False
+        for bucket, limit in self._EXPIRY_BUCKET_LIMITS:
+            upper = today + timedelta(days=limit)
+            domain = [(date_field, "<", upper), ("expiry_bucket", "!=", bucket)]
+            if lower:
+                domain.append((date_field, ">=", lower))
+            records = Model.search(domain)
+            if records:
+                self.env.add_to_compute(field, records)
+                records.flush_recordset(["expiry_bucket"])
+                _logger.info(
+                    "Expiry bucket %s: %s %s records moved", self._name, len(records), bucket
+                )
+            lower = upper
+
+    @api.model
+    def _cron_refresh_expiry_buckets(self):
+        """Cron hằng ngày: cập nhật nhóm thời hạn cho mọi model kế thừa mixin"""
+        for model_name in self.env.registry.descendants([self._name], "_inherit"):
+            Model = self.env[model_name]
+            if Model._abstract:
+                continue
+            Model._refresh_expiry_buckets()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+from odoo import models, api, tools
+from odoo.tools import frozendict
+
+
+class HrEmployee(models.Model):
+    """Tra cứu sơ đồ tổ chức: user → user của quản lý trực tiếp (parent_id).
+
+    Dùng chung cho Hợp đồng, Công văn, Portal... để xác định Trưởng phòng
+    của người yêu cầu mà không phải search hr.employee cho từng bản ghi.
+    """
+
+    _inherit = "hr.employee"
+
+    _ORG_CHART_FIELDS = ("user_id", "parent_id", "active")
+    _ORG_CHART_CACHE = "hr.employee.org_chart"
+
+    @api.model
+    def _get_org_chart_manager_map(self):
+        """Toàn bộ sơ đồ tổ chức {user_id: user_id quản lý} (cache theo phiên bản)"""
+        version = self.env["trasas.cache.version"]._get_version(self._ORG_CHART_CACHE)
+        return self._get_org_chart_manager_map_cached(version)
+
+    @api.model
+    @tools.ormcache("version")
+    def _get_org_chart_manager_map_cached(self, version):
+        employees = self.sudo().search_fetch(
+            [("user_id", "!=", False)], ["user_id", "parent_id"], order="id"
+        )
+        manager_map = {}
+        for employee in employees:
+            # Nếu 1 user có nhiều hồ sơ nhân viên, giữ hồ sơ đầu tiên
+            manager_map.setdefault(
+                employee.user_id.id, employee.parent_id.user_id.id or False
+            )
+        return frozendict(manager_map)
+
+    @api.model
+    def _get_manager_user_map(self, user_ids):
+        """Map nhiều user → user của quản lý trực tiếp.
+
+        Args:
+            user_ids (list[int]): Danh sách user cần tra cứu
+
+        Returns:
+            dict: {user_id: manager_user_id hoặc False}
+        """
+        chart = self._get_org_chart_manager_map()
+        return {user_id: chart.get(user_id, False) for user_id in user_ids}
+
+    def _invalidate_org_chart(self):
+        self.env["trasas.cache.version"]._bump_version(self._ORG_CHART_CACHE)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        if any(vals.get("user_id") for vals in vals_list):
+            records._invalidate_org_chart()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if any(f in vals for f in self._ORG_CHART_FIELDS):
+            self._invalidate_org_chart()
+        return res
+
+    def unlink(self):
+        has_user = any(self.mapped("user_id"))
+        res = super().unlink()
+        if has_user:
+            self._invalidate_org_chart()
+        return res
@@ -18,7 +18,7 @@
     """,
     "author": "LiemPhong",
     "website": "https://www.psmerp.vn",
-    "depends": ["fleet", "mail", "documents"],
+    "depends": ["fleet", "mail", "documents", "trasas_document_management"],
     "data": [
         # Security
         "security/ir.model.access.csv",
@@ -174,71 +174,49 @@ class FleetLegalDocument(models.Model):
                 rec.synced_document_ids.sudo().unlink()
         return super().unlink()
 
+    def init(self):
+        self.env["trasas.document.attachment.link"]._backfill_from_description(
+            self._name
+        )
+
     def _sync_attachments_to_documents(self):
         """Tạo documents.document cho mỗi attachment chưa đồng bộ,
-        đặt vào folder riêng của xe trong Documents."""
-        Document = self.env["documents.document"].sudo()
-        Attachment = self.env["ir.attachment"].sudo()
-        for rec in self:
-            if not rec.vehicle_id or not rec.attachment_ids:
-                continue
+        đặt vào folder riêng của xe trong Documents.
 
-            folder = rec.vehicle_id._get_or_create_document_folder()
-
-            # Thu thập attachment IDs đã sync (qua attachment_id trên document)
-            synced_att_ids = set()
-            for doc in rec.synced_document_ids:
-                if doc.attachment_id:
-                    # Lấy original att id từ description
-                    synced_att_ids.add(doc.attachment_id.description or "")
-
-            new_docs = Document
-            for att in rec.attachment_ids:
-                # Dùng att.id làm key để tránh duplicate
-                att_key = str(att.id)
-                if att_key in synced_att_ids:
-                    continue
-
-                # Tạo bản sao attachment (dùng res_model trung lập
-                # để tránh documents_fleet bridge tự tạo document)
-                att_copy = Attachment.create(
-                    {
-                        "name": att.name,
-                        "datas": att.datas,
-                        "mimetype": att.mimetype,
-                        "description": att_key,
-                        "res_model": "fleet.legal.document",
-                        "res_id": rec.id,
-                    }
-                )
-
-                # Tạo document với attachment_id
-                new_doc = Document.create(
-                    {
-                        "name": rec.name or att.name,
-                        "folder_id": folder.id,
-                        "attachment_id": att_copy.id,
-                        "owner_id": self.env.user.id,
-                    }
-                )
-                # Gắn res_model/res_id để smart button Documents đếm đúng
-                new_doc.write(
-                    {
-                        "res_model": "fleet.vehicle",
-                        "res_id": rec.vehicle_id.id,
-                    }
-                )
-                new_docs |= new_doc
-                _logger.info(
-                    ">>> Created document %s in folder %s for att %s",
-                    new_doc.id,
-                    folder.id,
-                    att.id,
-                )
-
-            if new_docs:
-                rec.sudo().write(
-                    {
-                        "synced_document_ids": [(4, doc.id) for doc in new_docs],
-                    }
-                )
+        Document dùng attachment phản chiếu cùng file với attachment gốc
+        (res_model trung lập để tránh documents_fleet bridge tự tạo document),
+        không sao chép nội dung file.
+        """
+        records = self.filtered(lambda r: r.vehicle_id and r.attachment_ids)
+        folders = {
+            vehicle: vehicle._get_or_create_document_folder()
+            for vehicle in records.vehicle_id
+        }
+        new_docs_map = self.env["trasas.document.attachment.link"]._sync_attachments(
+            [
+                (rec, rec.attachment_ids, {"folder_id": folders[rec.vehicle_id].id})
+                for rec in records
+            ]
+        )
+        for rec in records:
+            new_docs = new_docs_map.get(rec.id)
+            if not new_docs:
+                continue
+            # Gắn res_model/res_id để smart button Documents đếm đúng
+            new_docs.write(
+                {
+                    "res_model": "fleet.vehicle",
+                    "res_id": rec.vehicle_id.id,
+                }
+            )
+            rec.sudo().write(
+                {
+                    "synced_document_ids": [(4, doc.id) for doc in new_docs],
+                }
+            )
+            _logger.info(
+                ">>> Created %s documents in folder %s for %s",
+                len(new_docs),
+                folders[rec.vehicle_id].id,
+                rec,
+            )
@@ -1,6 +1,4 @@
 # -*- coding: utf-8 -*-
-import base64
-from werkzeug.urls import url_quote
 from odoo import http, fields
 from odoo.http import request
 
@@ -13,44 +11,39 @@ class PortalDocuments(http.Controller):
             raise_if_not_found=False,
         ).sudo()
 
+    def _get_folder_structure(self, root):
+        """Cây thư mục của workspace (được cache, xem documents.document)."""
+        return request.env["documents.document"]._get_portal_folder_structure(root.id)
+
     def _is_descendant_of(self, folder, root):
-        """Kiểm tra folder có là con cháu của root không (bảo mật)."""
-        current = folder
-        while current:
-            if current.id == root.id:
-                return True
-            current = current.folder_id
-        return False
+        """Kiểm tra folder (hoặc file) có nằm trong cây của root không (bảo mật)."""
+        folder_id = folder.id if folder.type == "folder" else folder.folder_id.id
+        return folder_id in self._get_folder_structure(root)["parents"]
 
     def _get_folder_tree(self, parent_folder):
-        """Đệ quy lấy cây thư mục con (chỉ type='folder')."""
-        Document = request.env["documents.document"].sudo()
-        folders = Document.search(
-            [
-                ("folder_id", "=", parent_folder.id),
-                ("type", "=", "folder"),
-                ("active", "=", True),
-            ],
-            order="sequence, name",
-        )
-        tree = []
-        for folder in folders:
-            tree.append(
+        """Lấy cây thư mục con (chỉ type='folder') từ cấu trúc đã cache."""
+        structure = self._get_folder_structure(parent_folder)
+
+        def build(folder_id):
+            return [
                 {
-                    "id": folder.id,
-                    "name": folder.name,
-                    "children": self._get_folder_tree(folder),
+                    "id": child_id,
+                    "name": structure["names"][child_id],
+                    "children": build(child_id),
                 }
-            )
-        return tree
+                for child_id in structure["children"].get(folder_id, ())
+            ]
+
+        return build(parent_folder.id)
 
     def _get_breadcrumb(self, current_folder, root):
         """Tạo breadcrumb từ folder hiện tại về root."""
+        structure = self._get_folder_structure(root)
         breadcrumb = []
-        parent = current_folder
-        while parent and parent.id != root.id:
-            breadcrumb.insert(0, {"id": parent.id, "name": parent.name})
-            parent = parent.folder_id
+        folder_id = current_folder.id
+        while folder_id and folder_id != root.id:
+            breadcrumb.insert(0, {"id": folder_id, "name": structure["names"][folder_id]})
+            folder_id = structure["parents"][folder_id]
         breadcrumb.insert(0, {"id": root.id, "name": root.name})
         return breadcrumb
 
@@ -104,49 +97,72 @@ class PortalDocuments(http.Controller):
             return True
         return False
 
-    def _check_portal_access(self, document):
-        """Kiểm tra portal user có quyền truy cập vào document restricted không.
-        Trả về True nếu user đã được cấp quyền qua documents.access.
+    def _make_document_response(self, document, as_attachment, filename=None):
+        """Trả file trực tiếp từ filestore (không decode base64 vào RAM).
+
+        Dùng ir.binary stream: hỗ trợ X-Sendfile nếu được cấu hình,
+        HTTP Range (tải PDF từng phần) và ETag/If-None-Match (dùng lại cache).
+        """
+        stream = request.env["ir.binary"]._get_stream_from(
+            document.attachment_id,
+            filename=filename or document.name,
+            mimetype=document.mimetype,
+        )
+        return stream.get_response(as_attachment=as_attachment)
+
+    def _resolve_portal_access(self, document_ids):
+        """Xác định quyền truy cập của portal user cho nhiều document cùng lúc.
+
+        Chỉ dùng 2 query bất kể số lượng document:
+        1. documents.access của partner hiện tại trên các document
+        2. trasas.doc.access.request đang chờ (gom nhóm theo document)
+
+        Returns:
+            dict: {"has_access": set, "expired": set, "pending": set} các document ID
         """
+        result = {"has_access": set(), "expired": set(), "pending": set()}
         partner = request.env.user.partner_id
-        if not partner:
-            return False
+        if not document_ids or not partner:
+            return result
 
-        access = request.env["documents.access"].sudo().search(
+        now = fields.Datetime.now()
+        accesses = request.env["documents.access"].sudo().search_fetch(
             [
-                ("document_id", "=", document.id),
+                ("document_id", "in", document_ids),
                 ("partner_id", "=", partner.id),
             ],
-            limit=1,
+            ["document_id", "expiration_date"],
         )
-        if not access:
-            return False
-
-        # Kiểm tra hết hạn
-        if access.expiration_date and access.expiration_date < fields.Datetime.now():
-            return False
-
-        return True
-
-    def _check_pending_request(self, document_ids):
-        """Kiểm tra xem portal user đã có yêu cầu pending cho document này chưa.
-        Trả về set document IDs đã có yêu cầu chưa xử lý.
-        """
-        if not document_ids:
-            return set()
-        pending = request.env["trasas.doc.access.request"].sudo().search(
+        for access in accesses:
+            # Kiểm tra hết hạn
+            if access.expiration_date and access.expiration_date < now:
+                result["expired"].add(access.document_id.id)
+            else:
+                result["has_access"].add(access.document_id.id)
+        result["expired"] -= result["has_access"]
+
+        # Yêu cầu chưa xử lý của user cho các document này
+        pending_groups = request.env["trasas.doc.access.request"].sudo()._read_group(
             [
                 ("user_id", "=", request.env.user.id),
                 ("state", "in", ["draft", "submitted"]),
                 ("document_ids", "in", document_ids),
-            ]
+            ],
+            ["document_ids"],
         )
-        pending_doc_ids = set()
-        for req in pending:
-            for doc in req.document_ids:
-                if doc.id in document_ids:
-                    pending_doc_ids.add(doc.id)
-        return pending_doc_ids
+        requested_ids = set(document_ids)
+        result["pending"] = {
+            document.id
+            for (document,) in pending_groups
+            if document.id in requested_ids
+        }
+        return result
+
+    def _check_portal_access(self, document):
+        """Kiểm tra portal user có quyền truy cập vào document restricted không.
+        Trả về True nếu user đã được cấp quyền qua documents.access (chưa hết hạn).
+        """
+        return document.id in self._resolve_portal_access([document.id])["has_access"]
 
     @http.route(
         ["/my/documents", "/my/documents/<int:folder_id>"],
@@ -192,9 +208,9 @@ class PortalDocuments(http.Controller):
             order="sequence, name",
         )
 
-        # Kiểm tra yêu cầu đang chờ
+        # Quyền truy cập + yêu cầu đang chờ cho toàn bộ file restricted
         restricted_ids = [f.id for f in files if f.confidential_level == "restricted"]
-        pending_request_ids = self._check_pending_request(restricted_ids)
+        access = self._resolve_portal_access(restricted_ids)
 
         # Chuẩn bị dữ liệu file với icon và format size
         file_list = []
@@ -204,8 +220,8 @@ class PortalDocuments(http.Controller):
             has_pending = False
 
             if is_restricted:
-                has_access = self._check_portal_access(f)
-                has_pending = f.id in pending_request_ids
+                has_access = f.id in access["has_access"]
+                has_pending = f.id in access["pending"]
 
             file_list.append(
                 {
@@ -254,7 +270,7 @@ class PortalDocuments(http.Controller):
         if (
             not document.exists()
             or document.type != "binary"
-            or not document.datas
+            or not document.attachment_id
             or not self._is_descendant_of(document, root)
         ):
             return request.redirect("/my/documents")
@@ -270,19 +286,7 @@ class PortalDocuments(http.Controller):
         ):
             filename = f"{filename}.{document.file_extension}"
 
-        file_content = base64.b64decode(document.datas)
-
-        return request.make_response(
-            file_content,
-            headers=[
-                ("Content-Type", str(document.mimetype or "application/octet-stream")),
-                (
-                    "Content-Disposition",
-                    f"attachment; filename*=UTF-8''{url_quote(filename)}",
-                ),
-                ("Content-Length", str(len(file_content))),
-            ],
-        )
+        return self._make_document_response(document, True, filename)
 
     @http.route(
         "/my/documents/preview/<int:document_id>",
@@ -299,7 +303,7 @@ class PortalDocuments(http.Controller):
         if (
             not document.exists()
             or document.type != "binary"
-            or not document.datas
+            or not document.attachment_id
             or not self._is_descendant_of(document, root)
             or not self._can_preview(document)
         ):
@@ -310,20 +314,9 @@ class PortalDocuments(http.Controller):
             if not self._check_portal_access(document):
                 return request.redirect("/my/documents")
 
-        file_content = base64.b64decode(document.datas)
         filename = document.name or "preview"
 
-        return request.make_response(
-            file_content,
-            headers=[
-                ("Content-Type", str(document.mimetype or "application/octet-stream")),
-                (
-                    "Content-Disposition",
-                    f"inline; filename*=UTF-8''{url_quote(filename)}",
-                ),
-                ("Content-Length", str(len(file_content))),
-            ],
-        )
+        return self._make_document_response(document, False, filename)
 
     # =========================================================================
     # PORTAL ACCESS REQUEST
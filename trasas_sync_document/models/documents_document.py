@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+from collections import defaultdict
+
+from odoo import models, api, tools
+from odoo.tools import frozendict
+
+
+class DocumentsDocument(models.Model):
+    """Cache cây thư mục hiển thị trên Portal (/my/documents)."""
+
+    _inherit = "documents.document"
+
+    _PORTAL_TREE_FIELDS = {"name", "folder_id", "active", "sequence", "type"}
+    _PORTAL_TREE_CACHE = "documents.document.portal_tree"
+
+    @api.model
+    def _get_portal_folder_structure(self, root_id):
+        """Toàn bộ cây thư mục (active) dưới workspace ``root_id``, lấy bằng 1 query.
+
+        Cache theo phiên bản ``trasas.cache.version``, chỉ tăng khi thư mục
+        trong cây Portal thay đổi.
+
+        Returns:
+            frozendict: {
+                "parents": {folder_id: parent_id} (root → False),
+                "names": {folder_id: name},
+                "children": {folder_id: (child_id, ...)} theo thứ tự sequence, name,
+            }
+        """
+        version = self.env["trasas.cache.version"]._get_version(self._PORTAL_TREE_CACHE)
+        return self._get_portal_folder_structure_cached(root_id, version)
+
+    @api.model
+    @tools.ormcache("root_id", "version")
+    def _get_portal_folder_structure_cached(self, root_id, version):
+        folders = self.sudo().search_fetch(
+            [
+                ("id", "child_of", root_id),
+                ("type", "=", "folder"),
+                ("active", "=", True),
+            ],
+            ["name", "folder_id"],
+            order="sequence, name",
+        )
+        names = {}
+        children = defaultdict(list)
+        for folder in folders:
+            names[folder.id] = folder.name
+            children[folder.folder_id.id].append(folder.id)
+
+        # Chỉ giữ các folder nối được về root (bỏ nhánh nằm dưới folder đã lưu trữ)
+        parents = {root_id: False}
+        stack = [root_id]
+        while stack:
+            parent_id = stack.pop()
+            for child_id in children.get(parent_id, ()):
+                parents[child_id] = parent_id
+                stack.append(child_id)
+
+        return frozendict(
+            {
+                "parents": frozendict(parents),
+                "names": frozendict(
+                    {folder_id: names.get(folder_id, "") for folder_id in parents}
+                ),
+                "children": frozendict(
+                    {folder_id: tuple(children.get(folder_id, ())) for folder_id in parents}
+                ),
+            }
+        )
+
+    def _touches_portal_tree(self):
+        """Có thư mục nào (hoặc thư mục cha của nó) nằm trong cây Portal không"""
+        folders = self.filtered(lambda rec: rec.type == "folder")
+        if not folders:
+            return False
+        root = self.env.ref(
+            "trasas_document_management.workspace_trasas_internal_docs",
+            raise_if_not_found=False,
+        )
+        if not root:
+            return False
+        tree = self._get_portal_folder_structure(root.id)["parents"]
+        return any(
+            folder.id in tree or folder.folder_id.id in tree for folder in folders
+        )
+
+    def _invalidate_portal_tree(self):
+        self.env["trasas.cache.version"]._bump_version(self._PORTAL_TREE_CACHE)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        if records._touches_portal_tree():
+            records._invalidate_portal_tree()
+        return records
+
+    def write(self, vals):
+        tracked = self._PORTAL_TREE_FIELDS.intersection(vals)
+        touched = tracked and self._touches_portal_tree()
+        res = super().write(vals)
+        if tracked and (touched or self._touches_portal_tree()):
+            self._invalidate_portal_tree()
+        return res
+
+    def unlink(self):
+        touched = self._touches_portal_tree()
+        res = super().unlink()
+        if touched:
+            self._invalidate_portal_tree()
+        return res